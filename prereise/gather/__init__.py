@@ -1,4 +1,5 @@
 __all__ = [
+    "cache_util",
     "demanddata",
     "helpers",
     "hydrodata",
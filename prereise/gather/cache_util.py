@@ -0,0 +1,110 @@
+import os
+import threading
+
+import pandas as pd
+
+_tables = {}
+
+# Layout of the pickle files, to be incremented when it changes
+_format_version = 1
+
+
+def load_cached_table(file, build, cache_file=None, version=0):
+    """Load a table derived from a file, parsing the file only once. The table is
+    kept in memory and in a pickle file next to the source file, which are reused
+    by all subsequent calls, in this process or others, as long as the
+    modification time and size of the source file, the build function and its
+    version are unchanged.
+
+    :param str file: path to the source file.
+    :param callable build: function taking the path to the source file as sole
+        argument and returning the table.
+    :param str cache_file: path to the pickle file. Default to the path of the
+        source file with a *'.pkl'* extension.
+    :param int version: version of the table returned by ``build``, to be
+        incremented when its content or data types change.
+    :return: (*pandas.DataFrame*) -- a copy of the table.
+    """
+    stat = os.stat(file)
+    builder = getattr(build, "__qualname__", type(build).__qualname__)
+    signature = (
+        _format_version,
+        f"{build.__module__}.{builder}",
+        version,
+        stat.st_mtime_ns,
+        stat.st_size,
+    )
+    if cache_file is None:
+        cache_file = os.path.splitext(file)[0] + ".pkl"
+
+    key = (os.path.abspath(file), os.path.abspath(cache_file))
+    if key not in _tables or _tables[key][0] != signature:
+        table = _read_cache_file(cache_file, signature)
+        if table is None:
+            table = build(file)
+            _write_cache_file(cache_file, signature, table)
+        _tables[key] = (signature, table)
+
+    return _tables[key][1].copy()
+
+
+def read_pickle(file):
+    """Read an object from a pickle file, treating any read error as a missing
+    file.
+
+    :param str file: path to the pickle file.
+    :return: (*object*) -- the object or None if the file does not exist or cannot
+        be read, e.g. if it is truncated or corrupt.
+    """
+    try:
+        return pd.read_pickle(file)
+    except Exception:
+        return None
+
+
+def write_pickle(obj, file):
+    """Write an object to a pickle file. The file is first written under a
+    temporary name and then renamed so that concurrent readers never see a partial
+    file. The temporary file is removed if writing fails.
+
+    :param object obj: object to write.
+    :param str file: path to the pickle file.
+    """
+    tmp_file = f"{file}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        pd.to_pickle(obj, tmp_file)
+        os.replace(tmp_file, file)
+    except BaseException:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        raise
+
+
+def _read_cache_file(cache_file, signature):
+    """Read a table from a pickle file.
+
+    :param str cache_file: path to the pickle file.
+    :param tuple signature: format version, build function and its version,
+        modification time and size of the source file.
+    :return: (*pandas.DataFrame*) -- the table or None if the file does not exist,
+        cannot be read or has been built from a different version of the source
+        file or with a different build function.
+    """
+    cached = read_pickle(cache_file)
+    if not isinstance(cached, dict) or cached.get("signature") != signature:
+        return None
+    return cached.get("table")
+
+
+def _write_cache_file(cache_file, signature, table):
+    """Write a table to a pickle file with :func:`write_pickle`. Nothing is written
+    if the directory is read-only.
+
+    :param str cache_file: path to the pickle file.
+    :param tuple signature: signature of the table, see :func:`_read_cache_file`.
+    :param pandas.DataFrame table: table to write.
+    """
+    try:
+        write_pickle({"signature": signature, "table": table}, cache_file)
+    except OSError:
+        pass
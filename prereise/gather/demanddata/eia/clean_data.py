@@ -1,34 +1,85 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
 import pandas as pd
 
-
-def fix_dataframe_outliers(demand):
+# Number of days each shifted demand is shifted by
+shift_days = {
+    "look_back1day": 1,
+    "look_forward1day": -1,
+    "look_back2day": 2,
+    "look_forward2day": -2,
+    "look_back1week": 7,
+    "look_forward1week": -7,
+}
+
+# Dicts of weekdays. 0 = Monday, 1 = Tuesday, etc.
+# day_map_1day: attempt to shift the data by only one day if possible
+# Do not fill in Mon-Fri with the weekend days and vice versa
+day_map_1day = {
+    0: ["look_forward1day"],
+    1: ["look_forward1day", "look_back1day"],
+    2: ["look_forward1day", "look_back1day"],
+    3: ["look_forward1day", "look_back1day"],
+    4: ["look_back1day"],
+    5: ["look_forward1day"],
+    6: ["look_back1day"],
+}
+
+# If we are still missing data, look two days
+day_map_2day = {
+    0: ["look_forward2day"],
+    1: ["look_forward2day"],
+    2: ["look_back2day", "look_forward2day"],
+    3: ["look_back2day"],
+    4: ["look_back2day"],
+    5: ["look_back1week", "look_forward1week"],
+    6: ["look_back1week", "look_forward1week"],
+}
+
+# Finally, check for data exactly one week ago / one week from date
+day_map_1week = {day: ["look_back1week", "look_forward1week"] for day in range(7)}
+
+
+def fix_dataframe_outliers(demand, max_workers=1):
     """Make a data frame of demand with outliers replaced with values interpolated
     from the non-outlier edge points using :py:func:`slope_interpolate`.
 
     :param pandas.Dataframe demand: demand data frame with UTC timestamp as indicss
         and BA name as column name.
+    :param int max_workers: number of processes cleaning the data. Each process
+        handles a block of BAs. If None, use all the processors of the machine. If
+        1, all BAs are cleaned at once in the current process.
     :return: (*pandas.DataFrame*) -- data frame with anomalous demand values replaced
         by interpolated values.
     """
-    demand_fix_outliers = pd.DataFrame(index=demand.index)
-    for ba in demand.columns.to_list():
-        demand_ba = demand[ba]
-        outlier_output = slope_interpolate(pd.DataFrame(demand_ba))
-        demand_fix_outliers[ba] = outlier_output[ba]
-    return demand_fix_outliers
+    if max_workers == 1 or demand.shape[1] < 2:
+        return slope_interpolate(demand)
+
+    n_block = min(max_workers or os.cpu_count(), len(demand.columns))
+    blocks = [
+        demand.iloc[:, c] for c in np.array_split(range(demand.shape[1]), n_block)
+    ]
+    with ProcessPoolExecutor(max_workers) as executor:
+        return pd.concat(executor.map(slope_interpolate, blocks), axis=1)
 
 
-def slope_interpolate(ba_df):
+def slope_interpolate(ba_df, return_report=False):
     """Look for demand outliers by applying a z-score threshold to the demand slope.
-    Loop through all the outliers detected, determine the non-outlier edge points and
-    then interpolate a line joining these 2 edge points. The line value at the
-    timestamp of the the outlier event is used to replace the anomalous value.
+    Group the outliers detected in runs, determine the non-outlier edge points of
+    each run and then interpolate a line joining these 2 edge points. The line value
+    at the timestamp of the the outlier event is used to replace the anomalous value.
+    All the columns are processed at once.
 
     :param pandas.DataFrame ba_df: demand data frame with UTC timestamp as indices and
         BA name as column name.
-    :return: (*pandas.DataFrame*) -- data frame indexed with anomalous demand values
-        replaced by interpolated values.
+    :param bool return_report: whether to return the runs of outliers replaced.
+    :return: (*pandas.DataFrame/tuple*) -- data frame indexed with anomalous demand
+        values replaced by interpolated values. If ``return_report`` is True, a
+        tuple whose second element is a data frame with *'ba'*, *'start'*, *'end'*
+        and *'length'* as columns giving the BA name, the first and last timestamp
+        and the number of hours of each run of outliers.
 
     .. note::
         It is implicitly assumed that:
@@ -48,62 +99,63 @@ def slope_interpolate(ba_df):
         should be considered, and other information may be needed to interpolate
         properly, for example, the temperature data or other relevant profiles.
     """
-    df = ba_df.copy()
-    ba_name = df.columns[0]
-
-    df["delta"] = df[ba_name].diff()
-    delta_mu = df["delta"].describe().loc["mean"]
-    delta_sigma = df["delta"].describe().loc["std"]
-    df["delta_zscore"] = np.abs((df["delta"] - delta_mu) / delta_sigma)
-
-    # Find the outliers
-    outlier_index_list = df.loc[df["delta_zscore"] > 5].index
-
-    hour_save = -1
-    for i in outlier_index_list:
-        hour_index = df.index.get_loc(i)
-        if hour_save == -1:
-            hour_save = hour_index
-            next_save = hour_index + 1
-            continue
-        if hour_index == next_save:
-            next_save = hour_index + 1
-            continue
-
-        # Check for zeros: consecutive zeros, which don't have delta_zscore
-        # exceed threshold, will get extrapolated to the next non-zero value.
-        # This is fine for, say up to 5 hours; will not be appropriate
-        # otherwise since it may not capture the periodic patterns.
-        # Print a warning
-
-        if df.iloc[hour_index - 1][ba_name] == 0:
-            next_save = hour_index + 1
-            continue
-
-        num = next_save - hour_save
-
-        if num > 4:
-            print("Too many zeros near ", i, "! Review data!")
-
-        start = df.iloc[hour_save - 1][ba_name]
-        dee = (df.iloc[next_save - 1][ba_name] - start) / num
-        for j in range(hour_save - 1, next_save):
-            save_me = df.iloc[j][ba_name]
-            df.iloc[j][ba_name] = start + (j - hour_save + 1) * dee
-            print(j, save_me, df.iloc[j][ba_name])
-        hour_save = hour_index
-        next_save = hour_index + 1
-
-    if hour_save != -1:
-        num = next_save - hour_save
-        start = df.iloc[hour_save - 1][ba_name]
-        dee = (df.iloc[next_save - 1][ba_name] - start) / num
-        for j in range(hour_save - 1, next_save):
-            save_me = df.iloc[j][ba_name]
-            df.iloc[j][ba_name] = start + (j - hour_save + 1) * dee
-            print(j, save_me, df.iloc[j][ba_name])
-
-    return df
+    demand = ba_df.to_numpy(dtype=float, copy=True)
+    column, first, last = _find_slope_outlier_runs(demand)
+
+    # Interpolate from the hour before the first outlier to the last outlier, the
+    # demand being correct after the last outlying slope.
+    num = last - first + 1
+    start = demand[first - 1, column]
+    dee = (demand[last, column] - start) / num
+    run = np.repeat(np.arange(len(num)), num + 1)
+    step = np.arange(len(run)) - np.repeat(np.cumsum(num + 1) - (num + 1), num + 1)
+    demand[first[run] - 1 + step, column[run]] = start[run] + step * dee[run]
+
+    df = pd.DataFrame(demand, index=ba_df.index, columns=ba_df.columns)
+    if not return_report:
+        return df
+
+    report = pd.DataFrame(
+        {
+            "ba": ba_df.columns[column],
+            "start": ba_df.index[first],
+            "end": ba_df.index[last],
+            "length": num,
+        }
+    )
+    return df, report
+
+
+def _find_slope_outlier_runs(demand, threshold=5):
+    """Find the runs of hours with outlying demand slope. A run is made of
+    consecutive outliers. Outliers following a zero demand are merged with the
+    previous run, consecutive zeros not being detected as outliers.
+
+    :param numpy.ndarray demand: demand with hours as rows and BAs as columns.
+    :param int/float threshold: z-score of the slope above which the slope is an
+        outlier.
+    :return: (*tuple*) -- arrays giving the column, the first hour and the last hour
+        of each run.
+    """
+    delta = np.full(demand.shape, np.nan)
+    delta[1:] = np.diff(demand, axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        delta_zscore = np.abs(
+            (delta - np.nanmean(delta, axis=0)) / np.nanstd(delta, axis=0, ddof=1)
+        )
+
+    # Outliers sorted by column then hour
+    column, hour = np.nonzero((delta_zscore > threshold).T)
+    is_start = np.ones(len(hour), dtype=bool)
+    same_column = column[1:] == column[:-1]
+    is_start[1:] = ~same_column | (
+        (hour[1:] != hour[:-1] + 1) & (demand[hour[1:] - 1, column[1:]] != 0)
+    )
+
+    run_start = np.flatnonzero(is_start)
+    run_end = np.append(run_start[1:] - 1, len(hour) - 1)
+
+    return column[run_start], hour[run_start], hour[run_end]
 
 
 def replace_with_shifted_demand(demand, start, end):
@@ -118,91 +170,189 @@ def replace_with_shifted_demand(demand, start, end):
         of interest.
     :return: (*pandas.DataFrame*) -- data frame with missing demand data filled in.
     """
-
-    # Create a data frame where each column is the same demand data,
-    # but shifted by a specific time interval
-    look_back1day = demand.shift(1, freq="D")
-    look_back2day = demand.shift(2, freq="D")
-    look_back1week = demand.shift(7, freq="D")
-    look_forward1day = demand.shift(-1, freq="D")
-    look_forward2day = demand.shift(-2, freq="D")
-    look_forward1week = demand.shift(-7, freq="D")
-
-    shifted_demand = pd.concat(
-        [
-            demand,
-            look_back1day,
-            look_forward1day,
-            look_back2day,
-            look_forward2day,
-            look_back1week,
-            look_forward1week,
-        ],
-        axis=1,
+    window = demand.loc[start:end].index
+    filled_demand = pd.DataFrame(np.nan, index=demand.index, columns=demand.columns)
+    filled_demand.iloc[demand.index.get_indexer(window)] = _get_shifted_demand(
+        demand, window
     )
+    return filled_demand
 
-    # Include only the dates we care about
-    shifted_demand = shifted_demand.loc[start:end]
-    shifted_demand["dayofweek"] = shifted_demand.index.dayofweek
-    column_names = [
-        "look_back1day",
-        "look_forward1day",
-        "look_back2day",
-        "look_forward2day",
-        "look_back1week",
-        "look_forward1week",
-        "dayofweek",
-    ]
 
-    # Dicts of weekdays. 0 = Monday, 1 = Tuesday, etc.
-    # day_map: attempt to shift the data by only one day if possible
-    # Do not fill in Mon-Fri with the weekend days and vice versa
-    day_map = {
-        0: ["look_forward1day"],
-        1: ["look_forward1day", "look_back1day"],
-        2: ["look_forward1day", "look_back1day"],
-        3: ["look_forward1day", "look_back1day"],
-        4: ["look_back1day"],
-        5: ["look_forward1day"],
-        6: ["look_back1day"],
-    }
+def _get_shifted_demand(demand, window):
+    """Fill missing demand with averages of nearby shifted demand, following the
+    weekday rules of :data:`day_map_1day`, :data:`day_map_2day` and
+    :data:`day_map_1week` in this order.
 
-    # If we are still missing data, look two days
-    more_days_map = {
-        0: ["look_forward2day"],
-        1: ["look_forward2day"],
-        2: ["look_back2day", "look_forward2day"],
-        3: ["look_back2day"],
-        4: ["look_back2day"],
-        5: ["look_back1week", "look_forward1week"],
-        6: ["look_back1week", "look_forward1week"],
-    }
+    :param pandas.DataFrame demand: data frame with hourly demand where the columns are
+        BA regions.
+    :param pandas.DatetimeIndex window: timestamps of the period of interest. Must be
+        in the index of ``demand``.
+    :return: (*numpy.ndarray*) -- demand in the period of interest with missing data
+        filled in when possible.
+    """
+    values = demand.to_numpy(dtype=float)
 
-    # Finally, check for data exactly one week ago / one week from date
-    more_more_days_map = {
-        0: ["look_back1week", "look_forward1week"],
-        1: ["look_back1week", "look_forward1week"],
-        2: ["look_back1week", "look_forward1week"],
-        3: ["look_back1week", "look_forward1week"],
-        4: ["look_back1week", "look_forward1week"],
-        5: ["look_back1week", "look_forward1week"],
-        6: ["look_back1week", "look_forward1week"],
+    # Position in the original data of the shifted demand at each timestamp of the
+    # period of interest, -1 when the shifted timestamp is not in the data
+    shift_row = {
+        name: demand.index.get_indexer(window - pd.Timedelta(days=days))
+        for name, days in shift_days.items()
     }
 
     # Attempt to shift demand data,
     # getting progressively more aggressive if necessary
-    filled_demand = pd.DataFrame(index=demand.index)
-    for baName in demand.columns:
-        shifted_demand_ba = shifted_demand.loc[:, [baName, "dayofweek"]]
-        shifted_demand_ba.columns = [baName] + column_names
-        shifted_demand_ba[baName] = fill_ba_demand(shifted_demand_ba, baName, day_map)
-        shifted_demand_ba[baName] = fill_ba_demand(
-            shifted_demand_ba, baName, more_days_map
-        )
-        filled_demand[baName] = fill_ba_demand(
-            shifted_demand_ba, baName, more_more_days_map
-        )
-    return filled_demand
+    filled = values[demand.index.get_indexer(window)]
+    dayofweek = window.dayofweek.to_numpy()
+    for day_map in [day_map_1day, day_map_2day, day_map_1week]:
+        for day in range(0, 7):
+            i, j = np.nonzero(np.isnan(filled) & (dayofweek == day)[:, None])
+            total = np.zeros(len(i))
+            count = np.zeros(len(i))
+            for name in day_map[day]:
+                k = shift_row[name][i]
+                shifted = np.where(k >= 0, values[k, j], np.nan)
+                found = ~np.isnan(shifted)
+                total[found] += shifted[found]
+                count += found
+            with np.errstate(invalid="ignore"):
+                filled[i, j] = total / count
+
+    return filled
+
+
+def fill_demand_gaps(demand, strategies=("shift_average", "seasonal_profile")):
+    """Fill missing demand by running gap filling strategies in priority order.
+    Each strategy estimates the demand from the original data and only fills the
+    cells left missing by the previous strategies.
+
+    :param pandas.DataFrame demand: data frame with hourly demand where the columns are
+        BA regions.
+    :param iterable strategies: strategies to run, in priority order. Each strategy
+        is either the name of a strategy in :data:`gap_filling_strategies` or a
+        function with the same signature: it takes the original demand and the
+        boolean array of the cells still missing and returns an array of the same
+        shape with the estimated demand in these cells, NaN where no estimate is
+        found. Values outside of the missing cells are ignored.
+    :return: (*tuple*) -- first element is the data frame with missing demand filled
+        in when possible. Second element is a data frame of the same shape giving
+        the name of the strategy which filled each cell, None for the cells which
+        were not missing or could not be filled.
+    :raises ValueError: if a strategy name is unknown.
+    """
+    filled = demand.to_numpy(dtype=float, copy=True)
+    filled_by = np.full(filled.shape, None, dtype=object)
+    for strategy in strategies:
+        if isinstance(strategy, str):
+            if strategy not in gap_filling_strategies:
+                raise ValueError(f"Unknown gap filling strategy: {strategy}")
+            name, strategy = strategy, gap_filling_strategies[strategy]
+        else:
+            name = strategy.__name__
+
+        missing = np.isnan(filled)
+        if not missing.any():
+            break
+        estimate = np.asarray(strategy(demand, missing), dtype=float)
+        found = missing & ~np.isnan(estimate)
+        filled[found] = estimate[found]
+        filled_by[found] = name
+
+    return (
+        pd.DataFrame(filled, index=demand.index, columns=demand.columns),
+        pd.DataFrame(filled_by, index=demand.index, columns=demand.columns),
+    )
+
+
+def fill_with_shift_average(demand, missing):
+    """Estimate demand with averages of nearby shifted demand. See
+    :func:`replace_with_shifted_demand`.
+
+    :param pandas.DataFrame demand: data frame with hourly demand where the columns are
+        BA regions.
+    :param numpy.ndarray missing: boolean array of the cells to estimate.
+    :return: (*numpy.ndarray*) -- estimated demand in the missing cells, NaN
+        elsewhere and where no estimate is found.
+    """
+    estimate = np.full(missing.shape, np.nan)
+    rows = np.flatnonzero(missing.any(axis=1))
+    estimate[rows] = _get_shifted_demand(demand, demand.index[rows])
+    return np.where(missing, estimate, np.nan)
+
+
+def fill_with_seasonal_profile(demand, missing):
+    """Estimate demand with the average demand at the same hour of the same weekday
+    in the same month.
+
+    :param pandas.DataFrame demand: data frame with hourly demand where the columns are
+        BA regions.
+    :param numpy.ndarray missing: boolean array of the cells to estimate.
+    :return: (*numpy.ndarray*) -- estimated demand in the missing cells, NaN
+        elsewhere and where no estimate is found.
+    """
+    index = demand.index
+    estimate = (
+        demand.astype(float)
+        .groupby([index.year, index.month, index.dayofweek, index.hour])
+        .transform("mean")
+        .to_numpy()
+    )
+    return np.where(missing, estimate, np.nan)
+
+
+def fill_with_linear_interpolation(demand, missing):
+    """Estimate demand by linear interpolation in time between the closest observed
+    values. Gaps at the edges of the data are not filled.
+
+    :param pandas.DataFrame demand: data frame with hourly demand where the columns are
+        BA regions.
+    :param numpy.ndarray missing: boolean array of the cells to estimate.
+    :return: (*numpy.ndarray*) -- estimated demand in the missing cells, NaN
+        elsewhere and where no estimate is found.
+    """
+    return _interpolate_missing(demand, missing, "time")
+
+
+def fill_with_spline_interpolation(demand, missing):
+    """Estimate demand by cubic spline interpolation through the observed values.
+    Gaps at the edges of the data are not filled.
+
+    :param pandas.DataFrame demand: data frame with hourly demand where the columns are
+        BA regions.
+    :param numpy.ndarray missing: boolean array of the cells to estimate.
+    :return: (*numpy.ndarray*) -- estimated demand in the missing cells, NaN
+        elsewhere and where no estimate is found.
+    """
+    return _interpolate_missing(demand, missing, "cubicspline")
+
+
+def _interpolate_missing(demand, missing, method):
+    """Interpolate the columns of demand with missing cells.
+
+    :param pandas.DataFrame demand: data frame with hourly demand where the columns are
+        BA regions.
+    :param numpy.ndarray missing: boolean array of the cells to estimate.
+    :param str method: interpolation method, see
+        :meth:`pandas.DataFrame.interpolate`.
+    :return: (*numpy.ndarray*) -- interpolated demand in the missing cells, NaN
+        elsewhere and where no estimate is found.
+    """
+    estimate = np.full(missing.shape, np.nan)
+    columns = np.flatnonzero(missing.any(axis=0))
+    estimate[:, columns] = (
+        demand.iloc[:, columns]
+        .astype(float)
+        .interpolate(method=method, limit_area="inside")
+        .to_numpy()
+    )
+    return np.where(missing, estimate, np.nan)
+
+
+gap_filling_strategies = {
+    "shift_average": fill_with_shift_average,
+    "seasonal_profile": fill_with_seasonal_profile,
+    "linear": fill_with_linear_interpolation,
+    "spline": fill_with_spline_interpolation,
+}
 
 
 def fill_ba_demand(df_ba, ba_name, day_map):
@@ -1,13 +1,25 @@
 import json
 import os
-from urllib.error import HTTPError, URLError
-from urllib.request import urlopen
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
+import numpy as np
 import pandas as pd
+import requests
 from pandas.tseries.offsets import DateOffset
+from requests.adapters import HTTPAdapter
 
+from prereise.gather.cache_util import load_cached_table, read_pickle, write_pickle
 
-def from_download(tok, start_date, end_date, offset_days, series_list):
+
+def from_download(
+    tok,
+    start_date,
+    end_date,
+    offset_days,
+    series_list,
+    max_workers=8,
+    store_dir=None,
+):
     """Download and assemble dataset of demand data per balancing authority for desired
     date range.
 
@@ -16,7 +28,13 @@ def from_download(tok, start_date, end_date, offset_days, series_list):
     :param pandas.Timestamp/numpy.datetime64/datetime.datetime end_date: end data.
     :param list series_list: list of demand series names provided by EIA, e.g.,
         ['EBA.AVA-ALL.D.H', 'EBA.AZPS-ALL.D.H'].
-    :param int offset_days: number of business days for data to stabilize.
+    :param int offset_days: number of business days for data to stabilize. With a
+        store, number of days downloaded again before the last stored value.
+    :param int max_workers: maximum number of series downloaded concurrently.
+    :param str store_dir: directory of the local store of the series. If given,
+        only the data not already in the store are downloaded, the store is
+        updated and the data frame is restricted to the requested dates. See
+        :func:`refresh_store`.
     :return: (*pandas.DataFrame*) -- data frame with UTC timestamp as indices and
         BA series name as column names.
     """
@@ -24,50 +42,85 @@ def from_download(tok, start_date, end_date, offset_days, series_list):
     timespan = pd.date_range(
         start_date, end_date - DateOffset(days=offset_days), tz="UTC", freq="H"
     )
-    df_all = pd.DataFrame(index=timespan)
 
-    for ba in series_list:
+    def download(ba):
         print("Downloading", ba)
-        d = EIAgov(tok, [ba])
-        df = d.get_data()
+        eia = EIAgov(tok, [ba], session)
+        if store_dir is not None:
+            return refresh_store(eia, store_dir, timespan[0], timespan[-1], offset_days)
+        df = eia.get_data()
         if df is not None:
-            df.index = pd.to_datetime(df["Date"])
-            df.drop(columns=["Date"], inplace=True)
-            df_all = pd.concat([df_all, df], axis=1)
-    return df_all
+            df.set_index("Date", inplace=True)
+        return df
+
+    with requests.Session() as session:
+        adapter = HTTPAdapter(pool_maxsize=max_workers)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        with ThreadPoolExecutor(max_workers) as executor:
+            data = [df for df in executor.map(download, series_list) if df is not None]
 
+    return pd.concat([pd.DataFrame(index=timespan)] + data, axis=1)
 
-def from_excel(directory, series_list, start_date, end_date):
+
+def from_excel(directory, series_list, start_date, end_date, max_workers=1):
     """Assemble EIA balancing authority (BA) data from pre-downloaded Excel
-    spreadsheets. The spreadsheets contain data from July 2015 to present.
+    spreadsheets. The spreadsheets contain data from July 2015 to present. The
+    data of each spreadsheet is cached in a pickle file next to the spreadsheet,
+    which is used as long as the spreadsheet is unchanged.
 
     :param str directory: location of Excel files.
     :param list series_list: list of BA initials, e.g., ['PSE',BPAT','CISO'].
     :param datetime.datetime start_date: desired start of dataset.
     :param datetime.datetime end_date: desired end of dataset.
+    :param int max_workers: number of processes loading the spreadsheets. If None,
+        use all the processors of the machine. If 1, spreadsheets are loaded
+        serially in the current process.
     :return: (*pandas.DataFrame*) -- data frame with UTC timestamp as indices and
         BA series name as column names.
     """
     timespan = pd.date_range(start_date, end_date, freq="H")
-    df_all = pd.DataFrame(index=timespan)
 
-    for ba in series_list:
-        print(ba)
-        filename = ba + ".xlsx"
-        df = pd.read_excel(
-            io=os.path.join(directory, filename), header=0, usecols="B,U"
-        )
-        df.index = pd.to_datetime(df["UTC Time"])
-        # Fill missing times
-        df = df.resample("H").asfreq()
-        df.drop(columns=["UTC Time"], inplace=True)
-        df.rename(columns={"Published D": ba}, inplace=True)
-        df_all = pd.concat([df_all, df], join="inner", axis=1)
+    files = [os.path.join(directory, ba + ".xlsx") for ba in series_list]
+    if max_workers == 1:
+        data = [_load_ba_excel(f) for f in files]
+    else:
+        with ProcessPoolExecutor(max_workers) as executor:
+            data = list(executor.map(_load_ba_excel, files))
+
+    return pd.concat([pd.DataFrame(index=timespan)] + data, join="inner", axis=1)
+
+
+def _load_ba_excel(file):
+    """Load the demand of a BA from its Excel spreadsheet, using the cached data
+    if any.
+
+    :param str file: path to the spreadsheet.
+    :return: (*pandas.DataFrame*) -- data frame with UTC timestamp as indices and
+        BA series name as column name.
+    """
+    print(os.path.splitext(os.path.basename(file))[0])
+    return load_cached_table(file, _read_ba_excel)
 
-    return df_all
 
+def _read_ba_excel(file):
+    """Read the demand of a BA from its Excel spreadsheet.
 
-def get_ba_demand(ba_code_list, start_date, end_date, api_key):
+    :param str file: path to the spreadsheet.
+    :return: (*pandas.DataFrame*) -- data frame with UTC timestamp as indices and
+        BA series name as column name.
+    """
+    df = pd.read_excel(io=file, header=0, usecols="B,U")
+    df.index = pd.to_datetime(df["UTC Time"])
+    # Fill missing times
+    df = df.resample("H").asfreq()
+    df.drop(columns=["UTC Time"], inplace=True)
+    ba = os.path.splitext(os.path.basename(file))[0]
+    df.rename(columns={"Published D": ba}, inplace=True)
+    return df
+
+
+def get_ba_demand(ba_code_list, start_date, end_date, api_key, store_dir=None):
     """Download the demand between two dates for a list of balancing authorities.
 
     :param pandas.DataFrame ba_code_list: List of BAs to download from eia.
@@ -76,33 +129,123 @@ def get_ba_demand(ba_code_list, start_date, end_date, api_key):
     :param pandas.Timestamp/numpy.datetime64/datetime.datetime end_date: end bound for
         the demand data frame.
     :param string api_key: api key to fetch data.
+    :param str store_dir: directory of the local store of the series. If given,
+        only the data not already in the store are downloaded. See
+        :func:`refresh_store`.
     :return: (*pandas.DataFrame*) -- data frame with columns of demand by BA.
     """
     series_list = [f"EBA.{ba}-ALL.D.H" for ba in ba_code_list]
     df = from_download(
-        api_key, start_date, end_date, offset_days=0, series_list=series_list
+        api_key,
+        start_date,
+        end_date,
+        offset_days=0,
+        series_list=series_list,
+        store_dir=store_dir,
     )
     df.columns = [ba.replace("EBA.", "").replace("-ALL.D.H", "") for ba in df.columns]
     return df
 
 
+def refresh_store(eia, store_dir, start_date, end_date, offset_days=0):
+    """Get a series from its local store, downloading only the dates which are not
+    in the store yet. The store of a series is a pickle file in ``store_dir``
+    holding the data along with the first timestamp requested so far and the last
+    timestamp with a value. Dates after this last timestamp are downloaded again
+    on the next call, since they may not have been published yet.
+
+    :param EIAgov eia: downloader of the series.
+    :param str store_dir: directory of the local store.
+    :param pandas.Timestamp start_date: first timestamp.
+    :param pandas.Timestamp end_date: last timestamp.
+    :param int offset_days: number of days before the last timestamp with a value
+        which are downloaded again, to get the revisions of the most recent data.
+    :return: (*pandas.DataFrame*) -- data frame with UTC timestamp as indices and
+        the series name as column name, restricted to the requested dates. None if
+        the series has never been downloaded successfully.
+    """
+    ser = eia.series[0]
+    start_date, end_date = _to_utc(start_date), _to_utc(end_date)
+    store_file = os.path.join(store_dir, ser + ".pkl")
+    hour = pd.Timedelta(hours=1)
+    # A store which cannot be read is downloaded again
+    store = read_pickle(store_file)
+
+    # Past data are requested once, the store is extended backward from the first
+    # requested timestamp and forward from the last timestamp with a value
+    missing = []
+    if not isinstance(store, dict) or "last" not in store:
+        store = {"start": start_date, "last": None, "data": None}
+        missing.append((start_date, end_date))
+    else:
+        if start_date < store["start"]:
+            missing.append((start_date, store["start"] - hour))
+        if store["last"] is None:
+            refresh = store["start"]
+        else:
+            refresh = store["last"] + hour - pd.Timedelta(days=offset_days)
+        if end_date >= refresh:
+            missing.append((max(refresh, store["start"]), end_date))
+
+    df = store["data"]
+    updated = False
+    for start, end in missing:
+        new = eia.get_data(start, end)
+        if new is None:
+            continue
+        # Downloaded values replace the stored ones, e.g. revisions
+        new = new.set_index("Date")
+        df = new if df is None else new.combine_first(df)
+        store["start"] = min(store["start"], start)
+        updated = True
+
+    if df is None:
+        return None
+
+    if updated:
+        store["data"] = df
+        store["last"] = df.iloc[:, 0].last_valid_index()
+        os.makedirs(store_dir, exist_ok=True)
+        write_pickle(store, store_file)
+
+    return df.loc[start_date:end_date]
+
+
+def _to_utc(date):
+    """Convert a date to a UTC timestamp. Dates without time zone are in UTC.
+
+    :param pandas.Timestamp/numpy.datetime64/datetime.datetime date: date.
+    :return: (*pandas.Timestamp*) -- timestamp with UTC time zone.
+    """
+    date = pd.Timestamp(date)
+    return date.tz_localize("UTC") if date.tz is None else date.tz_convert("UTC")
+
+
 class EIAgov(object):
     """Copied from `this link <https://quantcorner.wordpress.com/\
         2014/11/18/downloading-eias-data-with-python/>`_.
 
     :param str token: EIA token.
     :param list series: id code(s) of the series to be downloaded.
+    :param requests.Session session: session used to send the requests. Sharing a
+        session between instances reuses the connections to the EIA server. If
+        None, a new session is created.
     """
 
-    def __init__(self, token, series):
+    def __init__(self, token, series, session=None):
         self.token = token
         self.series = series
+        self.session = requests.Session() if session is None else session
 
-    def raw(self, ser):
+    def raw(self, ser, start=None, end=None):
         """Download json files from EIA.
 
         :param str ser: list of file names.
-        :raises keyError: when URL or file are either not found or not valid.
+        :param pandas.Timestamp start: first timestamp to download. If None, start
+            from the beginning of the series.
+        :param pandas.Timestamp end: last timestamp to download. If None, download
+            up to the end of the series.
+        :return: (*dict*) -- the json file or None if the request failed.
         """
 
         url = (
@@ -111,30 +254,43 @@ class EIAgov(object):
             + "&series_id="
             + ser.upper()
         )
+        if start is not None:
+            url += "&start=" + _to_utc(start).strftime("%Y%m%dT%HZ")
+        if end is not None:
+            url += "&end=" + _to_utc(end).strftime("%Y%m%dT%HZ")
 
         try:
-            response = urlopen(url)
-            raw_byte = response.read()
-            raw_string = str(raw_byte, "utf-8-sig")
+            response = self.session.get(url)
+            response.raise_for_status()
+            raw_string = str(response.content, "utf-8-sig")
             jso = json.loads(raw_string)
             return jso
 
-        except HTTPError as e:
+        except requests.HTTPError as e:
             print("HTTP error type.")
-            print("Error code: ", e.code)
+            print("Error code: ", e.response.status_code)
 
-        except URLError as e:
+        except requests.RequestException as e:
             print("URL type error.")
-            print("Reason: ", e.reason)
-
-    def get_data(self):
-        """Convert json files into data frame.
-
-        :return: (*pandas.DataFrame*) -- data frame.
+            print("Reason: ", e)
+
+    def get_data(self, start=None, end=None):
+        """Convert json files into data frame. Series are aligned on their
+        timestamps.
+
+        :param pandas.Timestamp start: first timestamp to download. If None, start
+            from the beginning of the series.
+        :param pandas.Timestamp end: last timestamp to download. If None, download
+            up to the end of the series.
+        :return: (*pandas.DataFrame*) -- data frame with UTC timestamps in the
+            *'Date'* column, in ascending order, and series names as other columns.
         """
 
-        date_ = self.raw(self.series[0])
+        jso = {ser: self.raw(ser, start, end) for ser in self.series}
 
+        date_ = jso[self.series[0]]
+        if date_ is None:
+            return None
         if "data" in date_.keys() and "error" in date_["data"].keys():
             e = date_["data"]["error"]
             print(f"ERROR: {self.series[0]} not found. {e}")
@@ -143,23 +299,68 @@ class EIAgov(object):
             print(f"ERROR: {self.series[0]} was found but has no data")
             return None
 
-        date_series = date_["series"][0]["data"]
-        endi = len(date_series)
-        date = []
-        for i in range(endi):
-            date.append(date_series[i][0])
-
-        df = pd.DataFrame(data=date)
-        df.columns = ["Date"]
-
-        lenj = len(self.series)
-        for j in range(lenj):
-            data_ = self.raw(self.series[j])
-            data_series = data_["series"][0]["data"]
-            data = []
-            endk = len(date_series)
-            for k in range(endk):
-                data.append(data_series[k][1])
-            df[self.series[j]] = data
+        df = pd.concat(
+            [
+                _get_series_data(jso[ser]["series"][0]["data"], ser)
+                for ser in self.series
+            ],
+            axis=1,
+        ).sort_index()
+        df.index.name = "Date"
+        df.reset_index(inplace=True)
 
         return df
+
+
+def _get_series_data(data, name):
+    """Convert the data of an EIA series into a series.
+
+    :param list data: list of [date, value] pairs as found in the json file. Dates
+        in the *'YYYYMMDDTHHZ'* format are decoded at once, other formats (e.g. with
+        a UTC offset) are parsed by :func:`pandas.to_datetime`. Missing values are
+        None.
+    :param str name: name of the series.
+    :return: (*pandas.Series*) -- series with UTC timestamps as index. Only the
+        first value of duplicated timestamps is kept.
+    """
+    dates, values = zip(*data) if len(data) > 0 else ((), ())
+
+    series = pd.Series(
+        np.array(values, dtype=float), index=_get_utc_index(dates), name=name
+    )
+    duplicated = series.index.duplicated()
+    if duplicated.any():
+        print(f"{name}: dropping {duplicated.sum()} duplicated timestamps")
+        series = series[~duplicated]
+    return series
+
+
+def _get_utc_index(dates):
+    """Convert EIA dates into UTC timestamps.
+
+    :param tuple dates: dates as strings.
+    :return: (*pandas.DatetimeIndex*) -- UTC timestamps.
+    """
+    # Digits of the dates as an array with one row per date
+    length = np.array([len(d) for d in dates], dtype=int)
+    digits = np.array(dates, dtype="S12").view(np.uint8).reshape(-1, 12) - ord("0")
+    digits = digits.astype(np.int64)
+    numeric = np.delete(digits, [8, 11], axis=1)
+    if not (
+        np.all(length == 12)
+        and np.all(digits[:, 8] == ord("T") - ord("0"))
+        and np.all(digits[:, 11] == ord("Z") - ord("0"))
+        and np.all((numeric >= 0) & (numeric <= 9))
+    ):
+        return pd.DatetimeIndex(pd.to_datetime(list(dates), utc=True))
+
+    year = digits[:, 0] * 1000 + digits[:, 1] * 100 + digits[:, 2] * 10 + digits[:, 3]
+    month = digits[:, 4] * 10 + digits[:, 5]
+    day = digits[:, 6] * 10 + digits[:, 7]
+    hour = digits[:, 9] * 10 + digits[:, 10]
+
+    index = (
+        ((year - 1970) * 12 + month - 1).astype("datetime64[M]").astype("datetime64[h]")
+        + ((day - 1) * 24 + hour).astype("timedelta64[h]")
+    ).astype("datetime64[ns]")
+    return pd.DatetimeIndex(index).tz_localize("UTC")
@@ -1,7 +1,15 @@
+import json
+import os
+from functools import lru_cache
+
+import numpy as np
 import pandas as pd
 import requests
+from scipy import sparse
 from tqdm import tqdm
 
+from prereise.gather.cache_util import load_cached_table
+
 
 def aggregate_ba_demand(demand, mapping):
     """Aggregate demand in BAs to regions as defined in the mapping dictionary
@@ -10,26 +18,104 @@ def aggregate_ba_demand(demand, mapping):
     :param dict mapping: dictionary mapping of BA columns to regions.
     :return: (*pandas.DataFrame*) -- aggregated demand profiles
     """
-    agg_demand = pd.DataFrame(index=demand.index)
     for key in mapping:
-        mapping_bas = mapping[key]
-        valid_columns = list(set(mapping_bas) & set(demand.columns))
-        if len(valid_columns) < len(mapping_bas):
-            print()
-            print("******************************")
-            print(f"Missing BA columns for {key}!")
-            print(f"Original columns: {mapping_bas}")
-            print("******************************")
-
-        print(f"{key} regional demand was summed from {valid_columns}")
-        print()
-        if demand[valid_columns].shape[1] > 1:
-            agg_demand[key] = demand[valid_columns].sum(axis=1)
-        else:
-            agg_demand[key] = demand[valid_columns]
+        missing = set(mapping[key]) - set(demand.columns)
+        if len(missing) > 0:
+            print(f"Missing BA columns for {key}: {sorted(missing)}")
+
+    weights = get_region_weights(mapping, demand.columns)
+    values = demand.to_numpy(dtype=float)
+    is_missing = np.isnan(values)
+
+    # Missing demand is ignored when summing several BAs, region made of a single
+    # BA are missing when the BA is
+    agg_demand = map_demand(
+        pd.DataFrame(
+            np.where(is_missing, 0, values), index=demand.index, columns=demand.columns
+        ),
+        weights,
+    )
+    single = (weights != 0).sum(axis=0) == 1
+    ba = weights.loc[:, single].to_numpy().argmax(axis=0)
+    agg_demand.loc[:, single] = np.where(
+        is_missing[:, ba], np.nan, agg_demand.loc[:, single]
+    )
     return agg_demand
 
 
+def get_region_weights(mapping, ba_columns):
+    """Get the weights mapping BAs to the regions defined in the mapping dictionary.
+
+    :param dict mapping: dictionary mapping of BA columns to regions.
+    :param iterable ba_columns: name of the BAs, i.e. the columns of the demand
+        data frame.
+    :return: (*pandas.DataFrame*) -- weights with BA as index and region as columns.
+        Weight is 1 if the BA is in the region, 0 otherwise. BAs of the mapping
+        missing from ``ba_columns`` are ignored.
+    """
+    ba_columns = pd.Index(ba_columns)
+    weights = pd.DataFrame(0.0, index=ba_columns, columns=list(mapping))
+    for key in mapping:
+        weights.loc[ba_columns.intersection(mapping[key]), key] = 1.0
+    return weights
+
+
+def get_zone_weights(bus_map, mapping=None):
+    """Get the weights mapping BA regions to load zones. The demand of a BA region
+    is spread among load zones according to the real power demand of the buses.
+    The weights are computed once and can be used to map demand of any year with
+    :py:func:`map_demand`.
+
+    :param pandas.DataFrame bus_map: data frame with *'BA'*, *'zone_name'* and
+        *'Pd'* columns used to map BA regions to load zones using real power demand
+        weighting.
+    :param dict mapping: dictionary mapping of BA columns to regions. If given, the
+        weights map BAs to load zones instead, see :py:func:`get_region_weights`.
+    :return: (*pandas.DataFrame*) -- weights with BA region (or BA) as index and
+        load zone as columns.
+    """
+    ba_total = bus_map.groupby("BA", observed=True)["Pd"].transform("sum")
+    zone_scaling = (
+        bus_map.assign(zone_scaling=bus_map["Pd"] / ba_total)
+        .groupby(["BA", "zone_name"], observed=True)["zone_scaling"]
+        .sum()
+    )
+
+    # Zones are ordered by first appearance in the sorted BA regions
+    zones = zone_scaling.index.get_level_values("zone_name").unique()
+    weights = zone_scaling.unstack("zone_name", fill_value=0.0).loc[:, zones]
+    weights.columns.name = None
+    if mapping is not None:
+        ba_columns = pd.unique([ba for key in mapping for ba in mapping[key]])
+        weights = (
+            get_region_weights(mapping, ba_columns).loc[:, weights.index] @ weights
+        )
+    return weights
+
+
+def map_demand(demand, weights):
+    """Map demand profiles to other areas with a weight matrix. The sparsity of the
+    weights is used, the demand of an area is missing only when the demand of one of
+    the columns with a non-zero weight is.
+
+    :param pandas.DataFrame demand: demand profiles.
+    :param pandas.DataFrame weights: weights with demand columns as index and areas
+        as columns, e.g. as returned by :py:func:`get_zone_weights`.
+    :return: (*pandas.DataFrame*) -- demand profiles of the areas.
+    :raises KeyError: if columns with weights are missing from ``demand``.
+    """
+    weights = weights.loc[(weights != 0).any(axis=1)]
+    missing = weights.index.difference(demand.columns)
+    if len(missing) > 0:
+        raise KeyError(f"Missing demand columns: {list(missing)}")
+
+    values = demand.loc[:, weights.index].to_numpy(dtype=float)
+    matrix = sparse.csr_matrix(weights.to_numpy().T)
+    return pd.DataFrame(
+        (matrix @ values.T).T, index=demand.index, columns=weights.columns
+    )
+
+
 def get_demand_in_loadzone(agg_demand, bus_map):
     """Get demand in loadzones from aggregated demand of BA regions.
 
@@ -40,47 +126,41 @@ def get_demand_in_loadzone(agg_demand, bus_map):
     :return: (*pandas.DataFrame*) -- data frame with demand columns according
         to load zone.
     """
-    ba_agg = bus_map[["BA", "Pd"]].groupby("BA").sum().rename(columns={"Pd": "PdTotal"})
+    return map_demand(agg_demand, get_zone_weights(bus_map))
 
-    ba_scaling_factor = bus_map.merge(ba_agg, left_on="BA", right_on="BA")
-    ba_scaling_factor = ba_scaling_factor.assign(
-        zone_scaling=lambda x: x["Pd"] / x["PdTotal"]
-    )
-    ba_grouped_scaling = ba_scaling_factor.groupby(["BA", "zone_name"]).sum()
-
-    zone_demand = pd.DataFrame(index=agg_demand.index)
-    for ba_name in ba_grouped_scaling.index.unique(level="BA").to_list():
-        zone_scaling_df = ba_grouped_scaling.loc[ba_name]
-        for zone_name in zone_scaling_df.index.get_level_values(0).to_list():
-            if zone_name in zone_demand.columns.to_list():
-                zone_demand[zone_name] += (
-                    zone_scaling_df.loc[zone_name, "zone_scaling"] * agg_demand[ba_name]
-                )
-            else:
-                zone_demand[zone_name] = (
-                    zone_scaling_df.loc[zone_name, "zone_scaling"] * agg_demand[ba_name]
-                )
-    return zone_demand
-
-
-def map_buses_to_county(bus_county_map):
+
+def map_buses_to_county(bus_county_map, county_file=None, fallback=True):
     """Find the county in the U.S. territory that each bus in the query grid
     belongs to.
 
     :param pandas.DataFrame bus_county_map: data frame contains a list of
         entries with lat and long.
+    :param str county_file: path to a file of county boundaries. If given, counties
+        are found offline with :py:func:`find_county`.
+    :param bool fallback: whether to query the FCC API for the buses which are not
+        found in the county boundaries. Always True if ``county_file`` is None.
     :return: (*tuple*) -- first element is a data frame of counties that buses
         locate. Second element is a list of bus indices that no county matches.
     """
+    bus_county_map.loc[:, "County"] = None
+    bus_county_map.loc[:, "BA"] = None
+    if county_file is not None:
+        bus_county_map.loc[:, "County"] = find_county(
+            bus_county_map["lat"].to_numpy(),
+            bus_county_map["lon"].to_numpy(),
+            county_file,
+        )
+        if not fallback:
+            no_match = bus_county_map["County"].isna()
+            return bus_county_map, bus_county_map.index[no_match].to_list()
 
     # api-endpoint
     url = "https://geo.fcc.gov/api/census/block/find"
     # defining a params dict for the parameters to be sent to the API
 
-    bus_county_map.loc[:, "County"] = None
-    bus_county_map.loc[:, "BA"] = None
     bus_no_county_match = []
-    for index, row in tqdm(bus_county_map.iterrows(), total=len(bus_county_map)):
+    query = bus_county_map[bus_county_map["County"].isna()]
+    for index, row in tqdm(query.iterrows(), total=len(query)):
         params = {
             "latitude": row["lat"],
             "longitude": row["lon"],
@@ -95,3 +175,129 @@ def map_buses_to_county(bus_county_map):
         except TypeError:
             bus_no_county_match.append(index)
     return bus_county_map, bus_no_county_match
+
+
+def find_county(lat, lon, county_file, name_field="NAME", state_field="STUSPS"):
+    """Find the county containing each point, using county boundaries from a local
+    file. Points are tested against the counties whose bounding box contains them,
+    found through a spatial index built once per file.
+
+    :param numpy.ndarray lat: latitude of the points.
+    :param numpy.ndarray lon: longitude of the points.
+    :param str county_file: path to the county boundaries, e.g. the cartographic
+        boundary file of the U.S. Census Bureau. GeoJSON files only require shapely,
+        other formats are read with geopandas.
+    :param str name_field: name of the field holding the county name.
+    :param str state_field: name of the field holding the state abbreviation.
+    :return: (*numpy.ndarray*) -- county of each point, as *'name__state'*. None
+        for the points outside of all the counties.
+    """
+    import shapely
+
+    county, tree = _get_county_index(county_file, name_field, state_field)
+    point, polygon = tree.query(shapely.points(lon, lat), predicate="intersects")
+
+    # Points on a boundary are assigned to the first county
+    first = np.unique(point, return_index=True)[1]
+    result = np.full(len(lat), None, dtype=object)
+    result[point[first]] = county[polygon[first]]
+    return result
+
+
+@lru_cache(maxsize=4)
+def _get_county_index(county_file, name_field, state_field):
+    """Read county boundaries and build their spatial index.
+
+    :param str county_file: path to the county boundaries.
+    :param str name_field: name of the field holding the county name.
+    :param str state_field: name of the field holding the state abbreviation.
+    :return: (*tuple*) -- first element is an array of county names, as
+        *'name__state'*. Second element is the spatial index of the boundaries, as a
+        shapely.STRtree.
+    """
+    import shapely
+
+    if county_file.endswith((".json", ".geojson")):
+        with open(county_file) as f:
+            features = json.load(f)["features"]
+        properties = pd.DataFrame([feature["properties"] for feature in features])
+        geometry = shapely.from_geojson(
+            [json.dumps(feature["geometry"]) for feature in features]
+        )
+    else:
+        import geopandas
+
+        properties = geopandas.read_file(county_file).to_crs(epsg=4326)
+        geometry = properties.geometry.to_numpy()
+
+    county = (properties[name_field] + "__" + properties[state_field]).to_numpy()
+    return county, shapely.STRtree(geometry)
+
+
+# County names found by the FCC API which are spelled differently in the BA to
+# county file
+county_name_fix = {
+    "LaSalle__IL": "La_Salle__IL",
+    "Lac Qui Parle__MN": "Lac_qui_Parle__MN",
+    "Baltimore__MD": "Baltimore_County__MD",
+    "District of Columbia__DC": "Washington__DC",
+    "St. Louis City__MO": "St_Louis_Co__MO",
+}
+
+
+def get_ba_to_county():
+    """Get the BA area territory of the counties. The file listing the counties in
+    each BA area territory is only parsed once.
+
+    :return: (*pandas.DataFrame*) -- data frame with county name, as
+        *'name__state'*, as index and *'BA'* as categorical column.
+        ``get_ba_to_county().BA.to_dict()`` gives the county to BA dictionary.
+    """
+    file = os.path.join(
+        os.path.dirname(__file__), "..", "..", "data", "ba_to_county.txt"
+    )
+    return load_cached_table(os.path.abspath(file), _read_ba_to_county)
+
+
+def _read_ba_to_county(file):
+    """Read the file listing the counties in each BA area territory.
+
+    :param str file: path to the file.
+    :return: (*pandas.DataFrame*) -- data frame as returned by
+        :py:func:`get_ba_to_county`.
+    """
+    with open(file) as f:
+        groups = json.load(f)["groups"].values()
+    county = [c for g in groups for c in g["paths"]]
+    ba = [g["label"] for g in groups for _ in g["paths"]]
+    return pd.DataFrame(
+        {"BA": pd.Categorical(ba)}, index=pd.Index(county, name="County")
+    )
+
+
+def map_buses_to_ba(bus_county_map):
+    """Find the BA area territory that each bus belongs to, from its county.
+
+    :param pandas.DataFrame bus_county_map: data frame with *'County'* column as
+        returned by :py:func:`map_buses_to_county`.
+    :return: (*pandas.DataFrame*) -- the data frame with the *'BA'* column set, as
+        strings. BA is None for buses whose county is missing or not in any BA area
+        territory.
+    """
+    county = bus_county_map["County"].astype(object)
+    fixed = (
+        county.str.replace(" ", "_", regex=False)
+        .str.replace(".", "", regex=False)
+        .str.replace("-", "", regex=False)
+        .str.replace("'", "_", regex=False)
+        .mask(county.isin(county_name_fix.keys()), county.map(county_name_fix))
+    )
+
+    ba = get_ba_to_county().BA
+    position = ba.index.get_indexer(fixed)
+    # BA names are looked up through the category codes, the column is returned
+    # with object dtype so that it can be edited freely
+    names = np.append(ba.cat.categories.to_numpy(dtype=object), None)
+    codes = np.where(position >= 0, ba.cat.codes.to_numpy()[position], -1)
+    bus_county_map["BA"] = names[codes]
+    return bus_county_map
@@ -2,8 +2,15 @@ from random import random
 
 import numpy as np
 import pandas as pd
+import pytest
 
-from prereise.gather.demanddata.eia.clean_data import slope_interpolate
+from prereise.gather.demanddata.eia.clean_data import (
+    fill_demand_gaps,
+    fill_with_seasonal_profile,
+    fix_dataframe_outliers,
+    replace_with_shifted_demand,
+    slope_interpolate,
+)
 
 
 def test_slope_interpolate():
@@ -20,3 +27,126 @@ def test_slope_interpolate():
 
     assert r_dict[4] == (r_dict[3] + r_dict[5]) / 2
     assert r_dict[100] == (r_dict[99] + r_dict[101]) / 2
+
+
+def test_slope_interpolate_report():
+    demand = pd.DataFrame(
+        {"a": 5 + np.sin(np.pi * np.arange(200) / 8), "b": 5 + np.zeros(200)},
+        index=pd.date_range("2016-01-01", periods=200, freq="H"),
+    )
+    demand.iloc[50, 0] = 40
+    demand.iloc[120, 1] = 60
+    result, report = slope_interpolate(demand, return_report=True)
+
+    assert np.allclose(
+        result["a"].iloc[49:52], np.linspace(*demand.a.iloc[[49, 51]], 3)
+    )
+    assert result["b"].iloc[120] == 5
+    assert report.ba.tolist() == ["a", "b"]
+    assert report.start.tolist() == list(demand.index[[50, 120]])
+    assert report.end.tolist() == list(demand.index[[51, 121]])
+    assert report.length.tolist() == [2, 2]
+
+
+def test_fix_dataframe_outliers():
+    demand = pd.DataFrame(
+        {ba: 5 + np.sin(np.pi * np.arange(200) / 8) for ba in "abc"},
+        index=pd.date_range("2016-01-01", periods=200, freq="H"),
+    )
+    demand.iloc[50, 0] = 40
+    demand.iloc[120, 2] = 60
+
+    expected = demand.copy()
+    expected.iloc[50, 0] = (demand.iloc[49, 0] + demand.iloc[51, 0]) / 2
+    expected.iloc[120, 2] = (demand.iloc[119, 2] + demand.iloc[121, 2]) / 2
+    for max_workers in [1, 2]:
+        result = fix_dataframe_outliers(demand, max_workers)
+        pd.testing.assert_frame_equal(result, expected)
+
+
+def test_replace_with_shifted_demand():
+    index = pd.date_range("2016-01-04", periods=24 * 21, freq="H", tz="UTC")
+    demand = pd.DataFrame({"a": np.arange(len(index)), "b": 1.0}, index=index)
+    demand = demand.astype(float)
+    # Tuesday of the second week: average of Monday and Wednesday
+    demand.iloc[24 * 8, 0] = np.nan
+    # Monday and Tuesday of the second week: Wednesday for Monday
+    demand.iloc[24 * 7 + 1, 1] = np.nan
+    demand.iloc[24 * 8 + 1, 1] = np.nan
+    demand.iloc[24 * 9 + 1, 1] = 3
+    # Saturday of the second week and Sunday: previous and next Saturday
+    demand.iloc[24 * 12 + 2, 1] = np.nan
+    demand.iloc[24 * 13 + 2, 1] = np.nan
+
+    result = replace_with_shifted_demand(demand, index[24], index[-25])
+    assert result.loc[index[:24]].isna().all().all()
+    assert result.iloc[24 * 8, 0] == 24 * 8
+    assert result.iloc[24 * 7 + 1, 1] == 3
+    assert result.iloc[24 * 12 + 2, 1] == 1
+    assert result.loc[index[24:-24]].notna().all().all()
+
+
+def test_fill_demand_gaps():
+    index = pd.date_range("2016-01-04", periods=24 * 14, freq="H", tz="UTC")
+    demand = pd.DataFrame({"a": np.arange(len(index)), "b": 1.0}, index=index)
+    demand = demand.astype(float)
+    # Filled by linear interpolation
+    demand.iloc[24 * 8 : 24 * 8 + 2, 0] = np.nan
+    # At the edge, filled by shifted demand
+    demand.iloc[0, 1] = np.nan
+    # Never filled
+    demand["c"] = np.nan
+
+    filled, filled_by = fill_demand_gaps(demand, ["linear", "shift_average"])
+    assert filled.iloc[24 * 8 : 24 * 8 + 2, 0].tolist() == [24 * 8, 24 * 8 + 1]
+    assert filled.iloc[0, 1] == 1
+    assert filled.c.isna().all()
+    assert filled_by.iloc[24 * 8 : 24 * 8 + 2, 0].tolist() == ["linear", "linear"]
+    assert filled_by.iloc[0, 1] == "shift_average"
+    assert filled_by.notna().sum().sum() == 3
+
+
+def test_fill_demand_gaps_seasonal_profile():
+    index = pd.date_range("2016-03-01", periods=24 * 31, freq="H", tz="UTC")
+    demand = pd.DataFrame({"a": np.arange(len(index), dtype=float)}, index=index)
+    # Hour 3 missing for two weeks, the middle day has no shifted demand
+    gap = (index.hour == 3) & (index.day >= 8) & (index.day <= 22)
+    demand.loc[gap, "a"] = np.nan
+    middle = index.get_loc(pd.Timestamp("2016-03-15 03:00", tz="UTC"))
+
+    filled, filled_by = fill_demand_gaps(demand)
+    assert filled_by.a.iloc[middle] == "seasonal_profile"
+    assert filled.a.iloc[middle] == (3 + 24 * 28 + 3) / 2
+    assert filled.a.notna().all()
+    assert set(filled_by.a[gap]) == {"shift_average", "seasonal_profile"}
+
+    missing = demand.isna().to_numpy()
+    estimate = fill_with_seasonal_profile(demand, missing)
+    assert np.isnan(estimate[~missing]).all()
+
+
+def test_fill_demand_gaps_spline():
+    index = pd.date_range("2016-01-01", periods=48, freq="H")
+    demand = pd.DataFrame({"a": (np.arange(48.0) - 20) ** 3 / 1000, "b": 1.0})
+    demand.index = index
+    expected = demand.a.copy()
+    demand.iloc[[0, 10, 11, 30], 0] = np.nan
+
+    filled, filled_by = fill_demand_gaps(demand, ["spline"])
+    assert np.allclose(filled.a.iloc[1:], expected.iloc[1:])
+    assert np.isnan(filled.a.iloc[0])
+    assert filled_by.a.iloc[[10, 11, 30]].tolist() == ["spline"] * 3
+    assert filled_by.b.isna().all()
+
+
+def test_fill_demand_gaps_custom_strategy():
+    def constant(demand, missing):
+        return np.full(demand.shape, 7.0)
+
+    demand = pd.DataFrame({"a": [1, np.nan, 3]})
+    filled, filled_by = fill_demand_gaps(demand, [constant])
+    assert filled.a.tolist() == [1, 7, 3]
+    assert filled_by.a.tolist() == [None, "constant", None]
+
+    with pytest.raises(ValueError):
+        fill_demand_gaps(demand, ["unknown"])
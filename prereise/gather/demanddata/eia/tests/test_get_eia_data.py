@@ -1,6 +1,9 @@
 import getpass
+import json
 import os
+import shutil
 from datetime import datetime
+from urllib.parse import parse_qs, urlparse
 
 import pandas as pd
 import pytest
@@ -39,6 +42,142 @@ def test_eia_download():
     assert len(this.columns) == (len(demand_list))
 
 
+class MockResponse:
+    def __init__(self, content):
+        self.content = content
+
+    def raise_for_status(self):
+        pass
+
+
+class MockSession:
+    def __init__(self, published="20180701T03Z"):
+        self.urls = []
+        self.published = published
+
+    def get(self, url):
+        self.urls.append(url)
+        query = {k: v[0] for k, v in parse_qs(urlparse(url).query).items()}
+        ser = query["series_id"]
+        data = [["20180701T%02dZ" % h, 100 * h] for h in range(3, -1, -1)]
+        data = [
+            d
+            for d in data
+            if query.get("start", d[0]) <= d[0] <= query.get("end", d[0])
+            and d[0] <= self.published
+        ]
+        if ser.startswith("EBA.CISO"):
+            data = data[::2]
+        return MockResponse(json.dumps({"series": [{"data": data}]}).encode())
+
+    def mount(self, prefix, adapter):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+def test_eia_get_data_download_each_series_once():
+    session = MockSession()
+    series = ["EBA.BANC-ALL.D.H", "EBA.BPAT-ALL.D.H"]
+    df = get_eia_data.EIAgov("token", series, session).get_data()
+    assert len(session.urls) == len(series)
+    assert list(df.columns) == ["Date"] + series
+    assert df["EBA.BPAT-ALL.D.H"].tolist() == [0, 100, 200, 300]
+
+
+def test_eia_get_data_align_series():
+    series = ["EBA.CISO-ALL.D.H", "EBA.BPAT-ALL.D.H"]
+    df = get_eia_data.EIAgov("token", series, MockSession()).get_data()
+    assert df["Date"].tolist() == list(
+        pd.date_range("2018-07-01 00:00:00", periods=4, freq="H", tz="UTC")
+    )
+    assert df["EBA.CISO-ALL.D.H"].fillna(-1).tolist() == [-1, 100, -1, 300]
+    assert df["EBA.BPAT-ALL.D.H"].tolist() == [0, 100, 200, 300]
+
+
+def test_from_download(monkeypatch):
+    session = MockSession()
+    monkeypatch.setattr(get_eia_data.requests, "Session", lambda: session)
+    start = pd.Timestamp("2018-07-01 00:00:00")
+    end = pd.Timestamp("2018-07-01 03:00:00")
+    demand_list = ["EBA.BANC-ALL.D.H", "EBA.BPAT-ALL.D.H"]
+    df = get_eia_data.from_download("token", start, end, 0, demand_list, 2)
+    assert len(session.urls) == len(demand_list)
+    assert list(df.columns) == demand_list
+    assert df.index.tz is not None
+    assert df["EBA.BANC-ALL.D.H"].tolist() == [0, 100, 200, 300]
+
+
+def test_from_download_with_store(monkeypatch, tmp_path):
+    session = MockSession()
+    monkeypatch.setattr(get_eia_data.requests, "Session", lambda: session)
+    demand_list = ["EBA.BANC-ALL.D.H"]
+
+    start = pd.Timestamp("2018-07-01 01:00:00")
+    end = pd.Timestamp("2018-07-01 02:00:00")
+    df = get_eia_data.from_download("token", start, end, 0, demand_list, 1, tmp_path)
+    assert df["EBA.BANC-ALL.D.H"].tolist() == [100, 200]
+    assert os.path.isfile(os.path.join(tmp_path, "EBA.BANC-ALL.D.H.pkl"))
+
+    end = pd.Timestamp("2018-07-01 03:00:00")
+    df = get_eia_data.from_download("token", start, end, 0, demand_list, 1, tmp_path)
+    assert df["EBA.BANC-ALL.D.H"].tolist() == [100, 200, 300]
+    assert "start=20180701T03Z&end=20180701T03Z" in session.urls[-1]
+
+    start = pd.Timestamp("2018-07-01 02:00:00")
+    df = get_eia_data.from_download("token", start, end, 0, demand_list, 1, tmp_path)
+    assert df["EBA.BANC-ALL.D.H"].tolist() == [200, 300]
+    assert len(session.urls) == 2
+
+
+def test_from_download_with_store_unpublished_data(monkeypatch, tmp_path):
+    session = MockSession(published="20180701T02Z")
+    monkeypatch.setattr(get_eia_data.requests, "Session", lambda: session)
+    demand_list = ["EBA.BANC-ALL.D.H"]
+
+    start = pd.Timestamp("2018-07-01 01:00:00")
+    end = pd.Timestamp("2018-07-01 03:00:00")
+    df = get_eia_data.from_download("token", start, end, 0, demand_list, 1, tmp_path)
+    assert df["EBA.BANC-ALL.D.H"].fillna(-1).tolist() == [100, 200, -1]
+
+    session.published = "20180701T03Z"
+    df = get_eia_data.from_download("token", start, end, 0, demand_list, 1, tmp_path)
+    assert df["EBA.BANC-ALL.D.H"].tolist() == [100, 200, 300]
+    assert "start=20180701T03Z&end=20180701T03Z" in session.urls[-1]
+
+
+def test_refresh_store_revisions(tmp_path):
+    session = MockSession()
+    eia = get_eia_data.EIAgov("token", ["EBA.BANC-ALL.D.H"], session)
+    start = pd.Timestamp("2018-07-01 00:00:00")
+    end = pd.Timestamp("2018-07-01 03:00:00")
+    get_eia_data.refresh_store(eia, tmp_path, start, end)
+
+    df = get_eia_data.refresh_store(eia, tmp_path, start, end, offset_days=1)
+    assert df["EBA.BANC-ALL.D.H"].tolist() == [0, 100, 200, 300]
+    assert "start=20180701T00Z&end=20180701T03Z" in session.urls[-1]
+    assert len(session.urls) == 2
+
+
+def test_from_download_with_corrupt_store(monkeypatch, tmp_path):
+    session = MockSession()
+    monkeypatch.setattr(get_eia_data.requests, "Session", lambda: session)
+    demand_list = ["EBA.BANC-ALL.D.H", "EBA.BPAT-ALL.D.H"]
+    with open(os.path.join(tmp_path, "EBA.BANC-ALL.D.H.pkl"), "wb") as f:
+        f.write(b"\x80\x04corrupt")
+
+    start = pd.Timestamp("2018-07-01 01:00:00")
+    end = pd.Timestamp("2018-07-01 02:00:00")
+    df = get_eia_data.from_download("token", start, end, 0, demand_list, 2, tmp_path)
+    assert df["EBA.BANC-ALL.D.H"].tolist() == [100, 200]
+    assert df["EBA.BPAT-ALL.D.H"].tolist() == [100, 200]
+    assert sorted(os.listdir(tmp_path)) == [s + ".pkl" for s in demand_list]
+
+
 def test_from_excel():
     """Tests data frame assembled from Excel spreadsheets manually downloaded
     from EIA. Test checks that correct number of columns are created.
@@ -52,3 +191,39 @@ def test_from_excel():
 
     ba_from_excel = get_eia_data.from_excel(dir1, ba_list, start, end)
     assert len(ba_from_excel.columns) == len(ba_list)
+
+
+def test_from_excel_cache(tmp_path):
+    dir1 = os.path.join(os.path.dirname(__file__), "data")
+    shutil.copy(os.path.join(dir1, "EPE.xlsx"), tmp_path)
+
+    start = pd.to_datetime("2015-07-01 08:00:00")
+    end = pd.to_datetime("2015-07-31 08:00:00")
+    first = get_eia_data.from_excel(tmp_path, ["EPE"], start, end)
+    assert os.path.isfile(os.path.join(tmp_path, "EPE.pkl"))
+
+    second = get_eia_data.from_excel(tmp_path, ["EPE"], start, end)
+    pd.testing.assert_frame_equal(first, second)
+    assert len(second) == len(pd.date_range(start, end, freq="H"))
+
+
+def test_get_series_data_dates():
+    data = [["20180701T03Z", 3], ["20180701T02Z", None]]
+    series = get_eia_data._get_series_data(data, "a")
+    assert series.index.tolist() == list(
+        pd.date_range("2018-07-01 03:00:00", periods=2, freq="-1H", tz="UTC")
+    )
+    assert series.fillna(-1).tolist() == [3, -1]
+
+    data = [["20180701T03-07", 3], ["20180701T02-07", 2]]
+    series = get_eia_data._get_series_data(data, "a")
+    assert series.index.tolist() == list(
+        pd.date_range("2018-07-01 10:00:00", periods=2, freq="-1H", tz="UTC")
+    )
+
+
+def test_get_series_data_duplicated_dates():
+    data = [["20180701T03Z", 3], ["20180701T03Z", 4], ["20180701T02Z", 2]]
+    series = get_eia_data._get_series_data(data, "a")
+    assert series.tolist() == [3, 2]
+    assert series.index.is_unique
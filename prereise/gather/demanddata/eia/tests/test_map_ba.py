@@ -1,9 +1,18 @@
+import json
+
+import numpy as np
 import pandas as pd
-from pandas.testing import assert_series_equal
+import pytest
+from pandas.testing import assert_frame_equal, assert_series_equal
 
 from prereise.gather.demanddata.eia.map_ba import (
     aggregate_ba_demand,
+    get_ba_to_county,
     get_demand_in_loadzone,
+    get_zone_weights,
+    map_buses_to_ba,
+    map_buses_to_county,
+    map_demand,
 )
 
 
@@ -39,6 +48,111 @@ def test_aggregate_ba_demand_sums_first_columns_pairs():
     assert result["CD"].tolist() == list(range(50, 70, 2))
 
 
+def test_aggregate_ba_demand_missing_values():
+    initial_df = create_ba_to_region_dataframe().astype(float)
+    initial_df.iloc[0, 0] = np.nan
+    mapping = {"AB": ["A", "B"], "A": ["A"]}
+    result = aggregate_ba_demand(initial_df, mapping)
+    assert result["AB"].tolist() == [10] + list(range(12, 30, 2))
+    assert np.isnan(result["A"].iloc[0])
+
+
+def test_get_zone_weights():
+    bus_map, agg_demand = create_loadzone_dataframe()
+    weights = get_zone_weights(bus_map)
+    assert weights.index.tolist() == ["A", "B", "C"]
+    assert weights.columns.tolist() == ["X", "Y"]
+    assert weights.values.tolist() == [[1 / 4, 3 / 4], [1 / 3, 2 / 3], [0, 1]]
+    assert_frame_equal(
+        map_demand(agg_demand, weights), get_demand_in_loadzone(agg_demand, bus_map)
+    )
+
+
+def test_get_zone_weights_from_ba():
+    bus_map, _ = create_loadzone_dataframe()
+    demand = create_ba_to_region_dataframe()
+    mapping = {"A": ["A", "B"], "B": ["C"], "C": ["D", "E"]}
+    zone_demand = map_demand(demand, get_zone_weights(bus_map, mapping))
+    expected = get_demand_in_loadzone(aggregate_ba_demand(demand, mapping), bus_map)
+    assert_frame_equal(zone_demand, expected)
+
+
+def test_map_buses_to_county_offline(tmp_path):
+    pytest.importorskip("shapely")
+    county_file = str(tmp_path / "county.geojson")
+    write_county_file(county_file)
+    bus = pd.DataFrame(
+        {"lat": [40.5, 40.5, 41.5, 40], "lon": [-100.5, -99.5, -100.5, -100]},
+        index=[10, 11, 12, 13],
+    )
+    bus_county, no_match = map_buses_to_county(bus, county_file, fallback=False)
+    assert bus_county["County"].tolist() == ["West__NE", "East__KS", None, "West__NE"]
+    assert no_match == [12]
+
+
+def test_get_ba_to_county():
+    ba_to_county = get_ba_to_county()
+    assert ba_to_county.index.is_unique
+    assert ba_to_county.BA.dtype == "category"
+    assert ba_to_county.BA.to_dict()["Hartford__CT"] == "ISONE"
+
+
+def test_map_buses_to_ba():
+    bus = pd.DataFrame(
+        {
+            "County": [
+                "Hartford__CT",
+                "Red River__TX",
+                "St. Louis City__MO",
+                None,
+                "Unknown__XX",
+            ]
+        }
+    )
+    bus_ba = map_buses_to_ba(bus)
+    assert bus_ba["BA"].iloc[:3].tolist() == ["ISONE", "ERCOT Texas", "MISO"]
+    assert bus_ba["BA"].iloc[3:].isna().all()
+
+    bus_ba.loc[4, "BA"] = "SWPP"
+    assert bus_ba["BA"].iloc[4] == "SWPP"
+
+
+def test_map_buses_to_ba_zone_weights():
+    bus = pd.DataFrame(
+        {
+            "County": ["Hartford__CT", "Hartford__CT", "Red River__TX"],
+            "zone_name": ["X", "Y", "Y"],
+            "Pd": [1.0, 3.0, 2.0],
+        }
+    )
+    bus_ba = map_buses_to_ba(bus)
+    mapping = {"ISONE": ["ISNE"], "ERCOT Texas": ["ERCO"], "MISO": ["MISO"]}
+    weights = get_zone_weights(bus_ba, mapping)
+    assert weights.index.tolist() == ["ISNE", "ERCO", "MISO"]
+    assert weights.columns.tolist() == ["Y", "X"]
+    assert weights.values.tolist() == [[3 / 4, 1 / 4], [1, 0], [0, 0]]
+
+    categories = get_ba_to_county().BA.cat.categories
+    bus_ba["BA"] = pd.Categorical(bus_ba["BA"], categories=categories)
+    assert_frame_equal(get_zone_weights(bus_ba, mapping), weights, check_like=True)
+
+
+def write_county_file(county_file):
+    features = [
+        {
+            "type": "Feature",
+            "properties": {"NAME": name, "STUSPS": state},
+            "geometry": {
+                "type": "Polygon",
+                "coordinates": [[[x, 40], [x + 1, 40], [x + 1, 41], [x, 41], [x, 40]]],
+            },
+        }
+        for name, state, x in [("West", "NE", -101), ("East", "KS", -100)]
+    ]
+    with open(county_file, "w") as f:
+        json.dump({"type": "FeatureCollection", "features": features}, f)
+
+
 def create_loadzone_dataframe():
     bus_map_data = {
         "BA": ["A", "A", "B", "A", "B", "C"],
@@ -1,80 +1,83 @@
 from collections import OrderedDict
 
-import dateutil
-import h5pyd
 import numpy as np
 import pandas as pd
-from tqdm import tqdm
 
-from prereise.gather.solardata.ga_wind.helpers import ll2ij
-from prereise.gather.solardata.helpers import get_plant_info_unique_location
+from prereise.gather.solardata.ga_wind.helpers import (
+    get_time_index,
+    get_time_slice,
+    ll2ij,
+    open_wtk,
+    read_time_series,
+)
+from prereise.gather.solardata.helpers import (
+    get_plant_info_unique_location,
+    get_power_output_data_frame,
+)
 
 
 def retrieve_data(
-    solar_plant, hs_api_key, start_date="2007-01-01", end_date="2014-01-01"
+    solar_plant,
+    hs_api_key,
+    start_date="2007-01-01",
+    end_date="2014-01-01",
+    tolerance=None,
+    file_path=None,
 ):
     """Retrieves irradiance data from Gridded Atmospheric Wind Integration
     National dataset.
 
     :param pandas.DataFrame solar_plant: data frame with *'lat'*, *'lon'* and
         *'Pmax'* as columns and *'plant_id'* as indices.
-    :param str hs_api_key: API key.
+    :param str hs_api_key: API key. Not used when ``file_path`` is given.
     :param str start_date: start date.
     :param str end_date: end date.
+    :param float tolerance: grid cell size (in degrees) used to merge nearby plant
+        locations in a single weather query. See
+        :func:`prereise.gather.solardata.helpers.get_plant_location_groups`.
+    :param str file_path: path to a local extract of the dataset. See
+        :func:`prereise.gather.solardata.ga_wind.helpers.open_wtk`.
     :return: (*pandas.DataFrame*) -- data frame with *'Pout'*, *'plant_id'*,
         *'ts'* and *'ts_id'* as columns. The power output is in MWh.
     """
 
     # Identify unique location
-    coord = get_plant_info_unique_location(solar_plant)
-
-    # Build query
-    hs_endpoint = "https://developer.nrel.gov/api/hsds/"
-    hs_username = None
-    hs_password = None
-
-    f = h5pyd.File(
-        "/nrel/wtk-us.h5",
-        "r",
-        username=hs_username,
-        password=hs_password,
-        endpoint=hs_endpoint,
-        api_key=hs_api_key,
-    )
-
-    # Get coordinates of nearest location
-    lat_origin, lon_origin = f["coordinates"][0][0]
-    ij = {}
-    for key in coord.keys():
-        ij[key] = ll2ij(lon_origin, lat_origin, float(key[0]), float(key[1]))
-
-    # Extract time series
-    dt = f["datetime"]
-    dt = pd.DataFrame({"datetime": dt[:]})
-    dt["datetime"] = dt["datetime"].apply(dateutil.parser.parse)
-
-    dt_range = dt.loc[(dt.datetime >= start_date) & (dt.datetime < end_date)]
-
-    data = pd.DataFrame({"Pout": [], "plant_id": [], "ts": [], "ts_id": []})
-
-    for (key, val) in tqdm(ij.items(), total=len(ij)):
-        ghi = f["GHI"][min(dt_range.index) : max(dt_range.index) + 1, val[0], val[1]]
-        data_loc = pd.DataFrame({"Pout": ghi})
-        data_loc["Pout"] /= max(ghi)
-        data_loc["ts_id"] = range(1, len(ghi) + 1)
-        data_loc["ts"] = pd.date_range(start=start_date, end=end_date, freq="H")[:-1]
-
+    coord = get_plant_info_unique_location(solar_plant, tolerance)
+
+    f = open_wtk(hs_api_key, file_path)
+    try:
+        # Get coordinates of nearest location
+        lat_origin, lon_origin = f["coordinates"][0][0]
+        i, j = ll2ij(
+            lon_origin,
+            lat_origin,
+            np.array([float(key[0]) for key in coord.keys()]),
+            np.array([float(key[1]) for key in coord.keys()]),
+            shape=f["GHI"].shape[1:],
+        )
+
+        # Extract time series
+        start, stop = get_time_slice(get_time_index(f), start_date, end_date)
+
+        ghi = read_time_series(f["GHI"], start, stop, np.column_stack([i, j]))
+    finally:
+        # A local extract is closed so that it can be rewritten
+        if file_path is not None:
+            if hasattr(f, "close"):
+                f.close()
+            else:
+                f.store.close()
+
+    ts = pd.date_range(start=start_date, end=end_date, freq="H")[:-1]
+    power = np.empty((len(ts), len(solar_plant)))
+    plant_id = np.empty(len(solar_plant), dtype=solar_plant.index.dtype)
+    ghi_norm = ghi / ghi.max(axis=0)
+
+    n = 0
+    for loc, key in enumerate(coord.keys()):
         for i in coord[key]:
-            data_site = data_loc.copy()
-            data_site["Pout"] *= i[1]
-            data_site["plant_id"] = i[0]
-
-            data = data.append(data_site, ignore_index=True, sort=False)
-
-    data["plant_id"] = data["plant_id"].astype(np.int32)
-    data["ts_id"] = data["ts_id"].astype(np.int32)
-
-    data.sort_values(by=["ts_id", "plant_id"], inplace=True)
-    data.reset_index(inplace=True, drop=True)
+            power[:, n] = ghi_norm[:, loc] * i[1]
+            plant_id[n] = i[0]
+            n += 1
 
-    return data
+    return get_power_output_data_frame(power, plant_id, ts)
@@ -1,30 +1,190 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import h5py
+import h5pyd
 import numpy as np
+import pandas as pd
 from pyproj import Proj
 
+_time_index = {}
 
-def ll2ij(lon_origin, lat_origin, lon, lat):
-    """Finds nearest x/y indices for a given lat/lon.
 
-    :param float lat_origin: latitude of coordinate of origin.
-    :param float lon_origin: longitude of coordinate of origin.
-    :param float lat: latitude of coordinate of interest.
-    :param float lon: longitude of coordinate of interest.
-    :return: (*tuple*) -- coordinate of the closest pixel in the database.
+def open_wtk(hs_api_key=None, file_path=None):
+    """Open the Gridded Atmospheric Wind Integration National dataset, either on
+    the HSDS service or from a local extract. A local extract must have the same
+    *'GHI'*, *'coordinates'* and *'datetime'* datasets as the original file.
+
+    :param str hs_api_key: API key for the HSDS service.
+    :param str file_path: path to a local HDF5 file or Zarr store (path ending
+        with *'.zarr'*). If None, the HSDS service is used.
+    :return: (*h5pyd.File/h5py.File/zarr.hierarchy.Group*) -- dataset.
     """
+    if file_path is None:
+        return h5pyd.File(
+            "/nrel/wtk-us.h5",
+            "r",
+            username=None,
+            password=None,
+            endpoint="https://developer.nrel.gov/api/hsds/",
+            api_key=hs_api_key,
+        )
+    if file_path.rstrip("/").endswith(".zarr"):
+        import zarr
+
+        return zarr.open_group(file_path, mode="r")
+    return h5py.File(file_path, "r")
 
+
+@lru_cache(maxsize=1)
+def _get_proj():
+    """Create the projection of the WTK grid.
+
+    :return: (*pyproj.Proj*) -- Lambert conformal conic projection.
+    """
     proj_string = """+proj=lcc +lat_1=30 +lat_2=60
                     +lat_0=38.47240422490422 +lon_0=-96.0
                     +x_0=0 +y_0=0 +ellps=sphere
                     +units=m +no_defs"""
 
-    proj2grid = Proj(proj_string)
+    return Proj(proj_string)
 
-    origin_xy = proj2grid(lon_origin, lat_origin)
-    target_xy = proj2grid(lon, lat)
 
-    delta = np.subtract(target_xy, origin_xy)
+def ll2ij(lon_origin, lat_origin, lon, lat, shape=None):
+    """Finds nearest x/y indices for given lat/lon.
+
+    :param float lat_origin: latitude of coordinate of origin.
+    :param float lon_origin: longitude of coordinate of origin.
+    :param float/numpy.ndarray lat: latitude of coordinate(s) of interest.
+    :param float/numpy.ndarray lon: longitude of coordinate(s) of interest.
+    :param tuple shape: number of cells of the grid along the y and x axes. If
+        given, indices are checked against it.
+    :return: (*tuple*) -- coordinate of the closest pixel in the database as
+        indices along the y and x axes. Indices are integers if ``lon`` and
+        ``lat`` are scalars, integer arrays otherwise.
+    :raises ValueError: if a coordinate is outside of the grid.
+    """
+    proj2grid = _get_proj()
+
+    origin_x, origin_y = proj2grid(lon_origin, lat_origin)
+    target_x, target_y = proj2grid(np.asarray(lon), np.asarray(lat))
 
     # 2-km grid resolution
-    ij = [int(round(x / 2000)) for x in delta]
+    i = np.round((target_y - origin_y) / 2000).astype(int)
+    j = np.round((target_x - origin_x) / 2000).astype(int)
+
+    if shape is not None:
+        outside = (i < 0) | (i >= shape[0]) | (j < 0) | (j >= shape[1])
+        if np.any(outside):
+            raise ValueError("coordinate outside of the grid")
+
+    if i.ndim == 0:
+        return int(i), int(j)
+    return i, j
+
+
+def read_time_series(
+    dataset, start, stop, ij, block_size=16, time_chunk=8760, max_workers=8
+):
+    """Read the time series of a (time, y, x) dataset at a set of grid cells.
+    Cells are grouped in square tiles and the bounding box of the cells in each
+    tile is read in a single request. Requests are further split along the time
+    axis to limit the size of the payload and are sent concurrently.
+
+    :param h5py.Dataset/h5pyd.Dataset dataset: dataset to read from.
+    :param int start: index of the first time step.
+    :param int stop: index following the last time step.
+    :param numpy.ndarray ij: array of shape (n, 2) giving the indices of the grid
+        cells along the y and x axes.
+    :param int block_size: width of the tiles (in number of cells).
+    :param int time_chunk: maximum number of time steps read in a single request.
+    :param int max_workers: maximum number of concurrent requests.
+    :return: (*numpy.ndarray*) -- array of shape (stop - start, n).
+    :raises ValueError: if a grid cell is outside the dataset.
+    """
+    ij = np.asarray(ij, dtype=int).reshape(-1, 2)
+    if np.any(ij < 0) or np.any(ij >= dataset.shape[1:]):
+        raise ValueError("grid cell outside of dataset")
+    data = np.empty((stop - start, len(ij)), dtype=dataset.dtype)
 
-    return tuple(reversed(ij))
+    _, tile_id = np.unique(ij // block_size, axis=0, return_inverse=True)
+    tile_id = tile_id.ravel()
+
+    requests = []
+    for tile in range(tile_id.max() + 1 if len(ij) > 0 else 0):
+        cells = np.flatnonzero(tile_id == tile)
+        (i0, j0), (i1, j1) = ij[cells].min(axis=0), ij[cells].max(axis=0) + 1
+        for t0 in range(start, stop, time_chunk):
+            t1 = min(t0 + time_chunk, stop)
+            requests.append((cells, t0, t1, i0, i1, j0, j1))
+
+    def read(request):
+        cells, t0, t1, i0, i1, j0, j1 = request
+        block = dataset[t0:t1, i0:i1, j0:j1]
+        data[t0 - start : t1 - start, cells] = block[
+            :, ij[cells, 0] - i0, ij[cells, 1] - j0
+        ]
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        list(executor.map(read, requests))
+
+    return data
+
+
+def get_time_index(f):
+    """Decode the time index of a WTK file. Timestamps are stored as fixed format
+    strings, which are parsed at once. The index of each file is only read and
+    decoded on first access, or again if a local file has been modified since.
+
+    :param h5py.File/h5pyd.File/zarr.hierarchy.Group f: dataset as returned by
+        :func:`open_wtk`.
+    :return: (*pandas.DatetimeIndex*) -- timestamps of the file.
+    """
+    key = _get_time_index_key(f)
+    if key in _time_index:
+        return _time_index[key]
+
+    raw = np.asarray(f["datetime"][:])
+    time_index = pd.DatetimeIndex(raw.astype("datetime64[ns]"))
+    if key is not None:
+        _time_index[key] = time_index
+    return time_index
+
+
+def _get_time_index_key(f):
+    """Build the key identifying the time index of a WTK file in the cache.
+
+    :param h5py.File/h5pyd.File/zarr.hierarchy.Group f: dataset as returned by
+        :func:`open_wtk`.
+    :return: (*tuple*) -- path of the file (or of the *'datetime'* array of a
+        Zarr store), followed by its modification time and size for local paths.
+        None if the dataset has no path, e.g. an in-memory Zarr store.
+    """
+    path = getattr(f, "filename", None)
+    if path is None:
+        store_path = getattr(getattr(f, "store", None), "path", None)
+        if store_path is None:
+            return None
+        path = os.path.join(store_path, f.path, "datetime")
+
+    if not os.path.exists(path):
+        # Domain on the HSDS service or remote store
+        return (path,)
+    stat = os.stat(path)
+    return os.path.abspath(path), stat.st_mtime_ns, stat.st_size
+
+
+def get_time_slice(time_index, start_date, end_date):
+    """Find the indices bounding a date range in a sorted time index.
+
+    :param pandas.DatetimeIndex time_index: sorted timestamps.
+    :param str start_date: start date (inclusive).
+    :param str end_date: end date (exclusive).
+    :return: (*tuple*) -- index of the first timestamp and index following the
+        last timestamp in the date range.
+    """
+    start, stop = time_index.searchsorted(
+        [pd.Timestamp(start_date), pd.Timestamp(end_date)]
+    )
+    return start, stop
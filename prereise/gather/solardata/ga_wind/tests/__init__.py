@@ -0,0 +1 @@
+__all__ = ["test_ga_wind", "test_helpers"]
@@ -0,0 +1,70 @@
+import h5py
+import numpy as np
+import pandas as pd
+import pytest
+
+from prereise.gather.solardata.ga_wind import ga_wind, helpers
+from prereise.gather.solardata.ga_wind.ga_wind import retrieve_data
+from prereise.gather.solardata.ga_wind.helpers import _get_proj
+
+
+@pytest.fixture
+def wtk_file(tmp_path):
+    proj = _get_proj()
+    x0, y0 = proj(-110.0, 30.0)
+    x, y = np.meshgrid(x0 + 2000 * np.arange(20), y0 + 2000 * np.arange(10))
+    lon, lat = proj(x, y, inverse=True)
+    dt = pd.date_range("2006-12-31", periods=96, freq="H")
+    ghi = np.arange(len(dt) * 10 * 20).reshape(len(dt), 10, 20) % 997
+
+    file_path = str(tmp_path / "wtk.h5")
+    with h5py.File(file_path, "w") as f:
+        f["GHI"] = ghi.astype(np.uint16)
+        f["coordinates"] = np.stack([lat, lon], axis=-1)
+        f["datetime"] = np.array(dt.strftime("%Y-%m-%d %H:%M:%S"), dtype="S19")
+    return file_path, ghi[24:72], lat, lon
+
+
+def test_retrieve_data_from_local_file(wtk_file):
+    file_path, ghi, lat, lon = wtk_file
+    solar_plant = pd.DataFrame(
+        {
+            "lat": [lat[5, 3], lat[2, 7], lat[5, 3]],
+            "lon": [lon[5, 3], lon[2, 7], lon[5, 3]],
+            "Pmax": [10.0, 20.0, 30.0],
+        },
+        index=pd.Index([3, 1, 2], name="plant_id"),
+    )
+    data = retrieve_data(
+        solar_plant,
+        None,
+        start_date="2007-01-01",
+        end_date="2007-01-03",
+        file_path=file_path,
+    )
+
+    assert len(data) == 48 * 3
+    assert data["plant_id"].tolist()[:3] == [1, 2, 3]
+    assert data["ts"].iloc[0] == pd.Timestamp("2007-01-01")
+    assert data["ts"].iloc[-1] == pd.Timestamp("2007-01-02 23:00")
+    for plant_id, (i, j) in zip([1, 2, 3], [(2, 7), (5, 3), (5, 3)]):
+        expected = ghi[:, i, j] / ghi[:, i, j].max() * solar_plant.Pmax[plant_id]
+        pout = data[data.plant_id == plant_id].Pout.values
+        np.testing.assert_allclose(pout, expected)
+
+
+def test_retrieve_data_closes_local_file(wtk_file, monkeypatch):
+    file_path, _, lat, lon = wtk_file
+    opened = []
+
+    def open_wtk(hs_api_key, file_path):
+        opened.append(helpers.open_wtk(hs_api_key, file_path))
+        return opened[-1]
+
+    monkeypatch.setattr(ga_wind, "open_wtk", open_wtk)
+    solar_plant = pd.DataFrame(
+        {"lat": [lat[5, 3]], "lon": [lon[5, 3]], "Pmax": [10.0]},
+        index=pd.Index([1], name="plant_id"),
+    )
+    retrieve_data(solar_plant, None, "2007-01-01", "2007-01-03", file_path=file_path)
+    assert not opened[0].id.valid
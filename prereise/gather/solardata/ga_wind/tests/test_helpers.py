@@ -0,0 +1,102 @@
+import os
+
+import h5py
+import numpy as np
+import pandas as pd
+import pytest
+
+from prereise.gather.solardata.ga_wind.helpers import (
+    get_time_index,
+    get_time_slice,
+    ll2ij,
+    open_wtk,
+    read_time_series,
+)
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    data = np.arange(30 * 20 * 40).reshape(30, 20, 40)
+    with h5py.File(tmp_path / "wtk.h5", "w") as f:
+        f["GHI"] = data
+    with h5py.File(tmp_path / "wtk.h5", "r") as f:
+        yield f["GHI"], data
+
+
+def test_read_time_series(dataset):
+    ghi, data = dataset
+    ij = np.array([[0, 0], [19, 39], [3, 35], [3, 2], [10, 10], [3, 2]])
+    result = read_time_series(ghi, 4, 27, ij, block_size=8, time_chunk=5)
+    assert result.shape == (23, 6)
+    np.testing.assert_array_equal(result, data[4:27, ij[:, 0], ij[:, 1]])
+
+
+def test_read_time_series_cell_outside_dataset(dataset):
+    ghi, _ = dataset
+    with pytest.raises(ValueError, match="grid cell outside of dataset"):
+        read_time_series(ghi, 0, 10, [[-1, 3]])
+    with pytest.raises(ValueError, match="grid cell outside of dataset"):
+        read_time_series(ghi, 0, 10, [[3, 40]])
+
+
+def test_get_time_index_and_slice(tmp_path):
+    dt = pd.date_range("2007-01-01", periods=72, freq="H")
+    with h5py.File(tmp_path / "wtk.h5", "w") as f:
+        f["datetime"] = np.array(dt.strftime("%Y-%m-%d %H:%M:%S"), dtype="S19")
+    with h5py.File(tmp_path / "wtk.h5", "r") as f:
+        time_index = get_time_index(f)
+        assert time_index.equals(dt)
+        assert get_time_index(f) is time_index
+
+    assert get_time_slice(time_index, "2007-01-02", "2007-01-03") == (24, 48)
+    assert get_time_slice(time_index, "2006-01-01", "2008-01-01") == (0, 72)
+
+
+def test_get_time_index_modified_file(tmp_path):
+    dt = pd.date_range("2007-01-01", periods=72, freq="H")
+    with h5py.File(tmp_path / "wtk.h5", "w") as f:
+        f["datetime"] = np.array(dt.strftime("%Y-%m-%d %H:%M:%S"), dtype="S19")
+    with h5py.File(tmp_path / "wtk.h5", "r") as f:
+        assert get_time_index(f).equals(dt)
+
+    dt = pd.date_range("2008-01-01", periods=72, freq="H")
+    with h5py.File(tmp_path / "wtk.h5", "w") as f:
+        f["datetime"] = np.array(dt.strftime("%Y-%m-%d %H:%M:%S"), dtype="S19")
+    os.utime(tmp_path / "wtk.h5", ns=(0, 10**18))
+    with h5py.File(tmp_path / "wtk.h5", "r") as f:
+        assert get_time_index(f).equals(dt)
+
+
+def test_get_time_index_zarr(tmp_path):
+    zarr = pytest.importorskip("zarr")
+    dt = pd.date_range("2007-01-01", periods=72, freq="H")
+    store = str(tmp_path / "wtk.zarr")
+    group = zarr.open_group(store, mode="w")
+    group["datetime"] = np.array(dt.strftime("%Y-%m-%d %H:%M:%S"), dtype="S19")
+
+    f = open_wtk(file_path=store)
+    time_index = get_time_index(f)
+    assert time_index.equals(dt)
+    assert get_time_index(open_wtk(file_path=store)) is time_index
+
+
+def test_ll2ij_scalar():
+    assert ll2ij(-110.0, 30.0, -110.0, 30.0) == (0, 0)
+    i, j = ll2ij(-110.0, 30.0, -109.5, 30.3)
+    assert (i, j) == (12, 27)
+    assert isinstance(i, int) and isinstance(j, int)
+
+
+def test_ll2ij_array():
+    lon = np.array([-110.0, -109.5, -109.1])
+    lat = np.array([30.0, 30.3, 30.6])
+    i, j = ll2ij(-110.0, 30.0, lon, lat, shape=(50, 60))
+    assert i.tolist() == [0, 12, 26]
+    assert j.tolist() == [0, 27, 48]
+
+
+def test_ll2ij_outside_grid():
+    with pytest.raises(ValueError, match="coordinate outside of the grid"):
+        ll2ij(
+            -110.0, 30.0, np.array([-109.5, -109.1]), np.array([30.3, 30.6]), (20, 60)
+        )
@@ -1,5 +1,6 @@
 from collections import OrderedDict
 
+import numpy as np
 import pandas as pd
 
 
@@ -32,23 +33,85 @@ def to_reise(data):
     return profile
 
 
-def get_plant_info_unique_location(plant):
+def get_power_output_data_frame(power, plant_id, ts):
+    """Build the data frame returned by the solar data retrieval functions.
+
+    :param numpy.ndarray power: power output (in MWh) with timestamps as rows and
+        plants as columns.
+    :param numpy.ndarray plant_id: id of the plants in the columns of ``power``.
+    :param pandas.DatetimeIndex ts: timestamps in the rows of ``power``.
+    :return: (*pandas.DataFrame*) -- data frame with *'Pout'*, *'plant_id'*,
+        *'ts'* and *'ts_id'* as columns sorted by timestamp and plant id.
+    """
+    n_ts, n_plant = power.shape
+    order = np.argsort(plant_id, kind="stable")
+
+    data = pd.DataFrame(
+        {
+            "Pout": power[:, order].ravel(),
+            "plant_id": np.tile(np.asarray(plant_id)[order], n_ts).astype(np.int32),
+            "ts": np.repeat(ts.values, n_plant),
+            "ts_id": np.repeat(np.arange(1, n_ts + 1), n_plant).astype(np.int32),
+        }
+    )
+
+    return data
+
+
+def get_plant_location_groups(plant, tolerance=None):
+    """Group plants by location.
+
+    :param pandas.DataFrame plant: plant data frame.
+    :param float tolerance: size (in degrees) of the cells of the grid used to
+        merge plants located close to one another, e.g. within a cell of the
+        weather data set. If None, only plants sharing the same coordinates are
+        grouped.
+    :return: (*tuple*) -- first element is a data frame with *'lat'* and *'lon'*
+        as columns and location id as index. Locations are ordered by first
+        appearance in ``plant`` and take the coordinates of their first plant.
+        Second element is an array giving the location id of each plant.
+    """
+    lat, lon = plant.lat.values, plant.lon.values
+    if tolerance is not None:
+        if tolerance <= 0:
+            raise ValueError("tolerance must be positive")
+        lat_key, lon_key = np.round(lat / tolerance), np.round(lon / tolerance)
+    else:
+        lat_key, lon_key = lat, lon
+
+    location_id = (
+        pd.DataFrame({"lon": lon_key, "lat": lat_key})
+        .groupby(["lon", "lat"], sort=False)
+        .ngroup()
+        .to_numpy()
+    )
+    _, first = np.unique(location_id, return_index=True)
+    location = pd.DataFrame({"lat": lat[first], "lon": lon[first]})
+
+    return location, location_id
+
+
+def get_plant_info_unique_location(plant, tolerance=None):
     """Identify unique location and return relevant information of plants at
     location.
 
     :param pandas.DataFrame plant: plant data frame.
+    :param float tolerance: grid cell size (in degrees) used to merge nearby
+        locations. See :func:`get_plant_location_groups`.
     :return: (*dict*) -- keys are coordinates of location. Values is a list of
         2-tuple giving the plant id at location along with its capacity.
     """
-    n_target = len(plant)
+    location, location_id = get_plant_location_groups(plant, tolerance)
+
+    plant_index = np.split(
+        np.argsort(location_id, kind="stable"),
+        np.cumsum(np.bincount(location_id))[:-1],
+    )
 
-    # Identify unique location
     coord = OrderedDict()
-    for i in range(n_target):
-        key = (str(plant.lon.values[i]), str(plant.lat.values[i]))
-        if key not in coord.keys():
-            coord[key] = [(plant.index[i], plant.Pmax.values[i])]
-        else:
-            coord[key].append((plant.index[i], plant.Pmax.values[i]))
+    for loc, idx in zip(location.itertuples(), plant_index):
+        coord[(str(loc.lon), str(loc.lat))] = list(
+            zip(plant.index[idx], plant.Pmax.values[idx])
+        )
 
     return coord
@@ -2,11 +2,14 @@ import numpy as np
 import pandas as pd
 from tqdm import tqdm
 
-from prereise.gather.solardata.helpers import get_plant_info_unique_location
+from prereise.gather.solardata.helpers import (
+    get_plant_location_groups,
+    get_power_output_data_frame,
+)
 from prereise.gather.solardata.nsrdb.nrel_api import NrelApi
 
 
-def retrieve_data(solar_plant, email, api_key, year="2016"):
+def retrieve_data(solar_plant, email, api_key, year="2016", tolerance=None):
     """Retrieve irradiance data from NSRDB and calculate the power output
     using a simple normalization.
 
@@ -16,41 +19,26 @@ def retrieve_data(solar_plant, email, api_key, year="2016"):
         `sign up <https://developer.nrel.gov/signup/>`_.
     :param str api_key: API key.
     :param str year: year.
+    :param float tolerance: grid cell size (in degrees) used to merge nearby plant
+        locations in a single weather query. See
+        :func:`prereise.gather.solardata.helpers.get_plant_location_groups`.
     :return: (*pandas.DataFrame*) -- data frame with *'Pout'*, *'plant_id'*,
         *'ts'* and *'ts_id'* as columns. The power output is in MWh.
     """
 
     # Identify unique location
-    coord = get_plant_info_unique_location(solar_plant)
+    location, location_id = get_plant_location_groups(solar_plant, tolerance)
 
     api = NrelApi(email, api_key)
 
-    data = pd.DataFrame({"Pout": [], "plant_id": [], "ts": [], "ts_id": []})
+    ts = pd.date_range(start=year, end=str(int(year) + 1), freq="H")[:-1]
+    ghi = np.empty((len(ts), len(location)))
+    for loc in tqdm(location.itertuples(), total=len(location)):
+        ghi[:, loc.Index] = api.get_psm3_at(
+            str(loc.lat), str(loc.lon), attributes="ghi", year=year, leap_day=True
+        ).data_resource.GHI.values
 
-    for key in tqdm(coord.keys(), total=len(coord)):
-        lat, lon = key[1], key[0]
-        data_loc = api.get_psm3_at(
-            lat, lon, attributes="ghi", year=year, leap_day=True
-        ).data_resource
-        ghi = data_loc.GHI.values
-        data_loc = pd.DataFrame({"Pout": ghi})
-        data_loc["Pout"] /= max(ghi)
-        data_loc["ts_id"] = range(1, len(ghi) + 1)
-        data_loc["ts"] = pd.date_range(start=year, end=str(int(year) + 1), freq="H")[
-            :-1
-        ]
+    ghi_norm = ghi / ghi.max(axis=0)
+    power = ghi_norm[:, location_id] * solar_plant.Pmax.values
 
-        for i in coord[key]:
-            data_site = data_loc.copy()
-            data_site["Pout"] *= i[1]
-            data_site["plant_id"] = i[0]
-
-            data = data.append(data_site, ignore_index=True, sort=False)
-
-    data["plant_id"] = data["plant_id"].astype(np.int32)
-    data["ts_id"] = data["ts_id"].astype(np.int32)
-
-    data.sort_values(by=["ts_id", "plant_id"], inplace=True)
-    data.reset_index(inplace=True, drop=True)
-
-    return data
+    return get_power_output_data_frame(power, solar_plant.index.values, ts)
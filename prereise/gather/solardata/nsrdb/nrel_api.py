@@ -1,7 +1,9 @@
 from dataclasses import dataclass
 from datetime import timedelta
+from functools import lru_cache
 from io import BytesIO
 
+import numpy as np
 import pandas as pd
 import requests
 
@@ -48,20 +50,17 @@ class Psm3Data:
         :return: (*dict*) -- a dictionary which can be passed to the pvwattsv7
             module
         """
+        index = self.data_resource.index
         result = {
             "lat": self.lat,
             "lon": self.lon,
             "tz": self.tz,
             "elev": self.elevation,
-            "year": self.data_resource.index.year.tolist(),
-            "month": self.data_resource.index.month.tolist(),
-            "day": self.data_resource.index.day.tolist(),
-            "hour": self.data_resource.index.hour.tolist(),
-            "minute": self.data_resource.index.minute.tolist(),
+            **_get_date_components(index.asi8.tobytes(), index.tz),
         }
         result.update(
             {
-                Psm3Data.rename_attrs[v]: self.data_resource[v].tolist()
+                Psm3Data.rename_attrs[v]: self.data_resource[v].to_numpy().tolist()
                 for v in Psm3Data.allowed_attrs.values()
                 if v in self.data_resource.columns
             }
@@ -69,6 +68,29 @@ class Psm3Data:
         return result
 
 
+@lru_cache(maxsize=32)
+def _get_date_components(index_bytes, tz):
+    """Split timestamps in the components expected by nrel-pysam. Sites share the
+    same time index for a given year (and time zone), hence the caching.
+
+    :param bytes index_bytes: raw bytes of the int64 representation of the
+        timestamps, used as cache key.
+    :param datetime.tzinfo tz: time zone of the timestamps, None if naive.
+    :return: (*dict*) -- year, month, day, hour and minute of the timestamps as
+        tuples.
+    """
+    index = pd.DatetimeIndex(np.frombuffer(index_bytes, dtype=np.int64))
+    if tz is not None:
+        index = index.tz_localize("UTC").tz_convert(tz)
+    return {
+        "year": tuple(index.year.tolist()),
+        "month": tuple(index.month.tolist()),
+        "day": tuple(index.day.tolist()),
+        "hour": tuple(index.hour.tolist()),
+        "minute": tuple(index.minute.tolist()),
+    }
+
+
 class NrelApi:
     """Provides an interface to the NREL API for PSM3 data. It supports
     downloading this data in csv format, which we use to calculate solar output
@@ -1,23 +1,43 @@
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
 import pandas as pd
 import PySAM.Pvwattsv7 as PVWatts
 import PySAM.PySSC as pssc
-from powersimdata.network.usa_tamu.constants.zones import (
-    abv2interconnect,
-    id2abv,
-    interconnect2abv,
-)
+from powersimdata.network.usa_tamu.constants.zones import abv2interconnect, id2abv
 from tqdm import tqdm
 
-from prereise.gather.solardata.helpers import get_plant_info_unique_location
+from prereise.gather.solardata.helpers import (
+    get_plant_info_unique_location,
+    get_plant_location_groups,
+    get_power_output_data_frame,
+)
 from prereise.gather.solardata.nsrdb.nrel_api import NrelApi
 from prereise.gather.solardata.pv_tracking import (
     get_pv_tracking_data,
-    get_pv_tracking_ratio_state,
+    get_pv_tracking_ratio,
 )
 
+default_pv_parameters = {
+    "dc_ac_ratio": 1.25,  # Inverter Loading Ratio
+    "tilt": 30,
+    "azimuth": 180,
+    "inv_eff": 94,
+    "losses": 14,
+    "gcr": 0.4,
+    "adjust:constant": 0,
+}
+
 
-def retrieve_data(solar_plant, email, api_key, year="2016", rate_limit=0.5):
+def retrieve_data(
+    solar_plant,
+    email,
+    api_key,
+    year="2016",
+    rate_limit=0.5,
+    max_workers=1,
+    tolerance=None,
+):
     """Retrieves irradiance data from NSRDB and calculate the power output using
     the System Adviser Model (SAM).
 
@@ -28,104 +48,239 @@ def retrieve_data(solar_plant, email, api_key, year="2016", rate_limit=0.5):
     :param str api_key: API key.
     :param str year: year.
     :param int/float rate_limit: minimum seconds to wait between requests to NREL
+    :param int max_workers: number of processes running the SAM simulations. If
+        None, use all the processors of the machine. If 1, simulations are run
+        serially in the current process.
+    :param float tolerance: grid cell size (in degrees) used to merge nearby plant
+        locations in a single weather query. See
+        :func:`prereise.gather.solardata.helpers.get_plant_location_groups`.
     :return: (*pandas.DataFrame*) -- data frame with *'Pout'*, *'plant_id'*,
         *'ts'* and *'ts_id'* as columns. The power output is in MWh.
     """
+    weather = retrieve_weather_data(
+        solar_plant, email, api_key, year, rate_limit, tolerance
+    )
+    return simulate_power(
+        solar_plant, weather, year, max_workers=max_workers, tolerance=tolerance
+    )
 
+
+def retrieve_weather_data(
+    solar_plant, email, api_key, year="2016", rate_limit=0.5, tolerance=None
+):
+    """Retrieves from NSRDB the weather data needed by SAM at the plant locations.
+    The result can be saved (e.g. with :func:`pandas.to_pickle`) and used to run
+    :func:`simulate_power` as many times as needed.
+
+    :param pandas.DataFrame solar_plant: data frame with *'lat'*, *'lon'* and
+        *'Pmax' as columns and *'plant_id'* as index.
+    :param str email: email used for API key
+        `sign up <https://developer.nrel.gov/signup/>`_.
+    :param str api_key: API key.
+    :param str year: year.
+    :param int/float rate_limit: minimum seconds to wait between requests to NREL
+    :param float tolerance: grid cell size (in degrees) used to merge nearby plant
+        locations in a single weather query. See
+        :func:`prereise.gather.solardata.helpers.get_plant_location_groups`.
+    :return: (*dict*) -- keys are the coordinates of the locations as returned by
+        :func:`prereise.gather.solardata.helpers.get_plant_info_unique_location`.
+        Values are the weather data at the locations as
+        :class:`prereise.gather.solardata.nsrdb.nrel_api.Psm3Data` objects.
+    """
     # SAM only takes 365 days.
-    try:
-        leap_day = (pd.Timestamp("%s-02-29-00" % year).dayofyear - 1) * 24
-        is_leap_year = True
-        dates = pd.date_range(start="%s-01-01-00" % 2015, freq="H", periods=365 * 24)
-        dates = dates.map(lambda t: t.replace(year=int(year)))
-    except ValueError:
-        leap_day = None
-        is_leap_year = False
-        dates = pd.date_range(start="%s-01-01-00" % year, freq="H", periods=365 * 24)
+    ts, _ = _get_sam_time_index(year)
+    dates = ts[(ts.month != 2) | (ts.day != 29)]
 
     # Identify unique location
-    coord = get_plant_info_unique_location(solar_plant)
-
-    data = pd.DataFrame({"Pout": [], "plant_id": [], "ts": [], "ts_id": []})
+    coord = get_plant_info_unique_location(solar_plant, tolerance)
 
-    # PV tracking ratios
-    # By state and by interconnect when EIA data do not have any solar PV in
-    # the state
-    pv_info = get_pv_tracking_data()
-    zone_id = solar_plant.zone_id.unique()
-    frac = {}
-    for i in zone_id:
-        state = id2abv[i]
-        frac[i] = get_pv_tracking_ratio_state(pv_info, [state])
-        if frac[i] is None:
-            frac[i] = get_pv_tracking_ratio_state(
-                pv_info, list(interconnect2abv[abv2interconnect[state]])
-            )
-
-    # Inverter Loading Ratio
-    ilr = 1.25
     api = NrelApi(email, api_key, rate_limit)
 
+    weather = {}
     for key in tqdm(coord.keys(), total=len(coord)):
         lat, lon = key[1], key[0]
-        solar_data = api.get_psm3_at(
+        weather[key] = api.get_psm3_at(
             lat,
             lon,
             attributes="dhi,dni,wind_speed,air_temperature",
             year=year,
             leap_day=False,
             dates=dates,
-        ).to_dict()
-
-        ssc = pssc.PySSC()
-
-        for i in coord[key]:
-            data_site = pd.DataFrame(
-                {
-                    "ts": pd.date_range(
-                        start="%s-01-01-00" % year, end="%s-12-31-23" % year, freq="H"
-                    )
-                }
-            )
-            data_site["ts_id"] = range(1, len(data_site) + 1)
-            data_site["plant_id"] = i[0]
-
-            power = 0
-            for j, axis in enumerate([0, 2, 4]):
-                pv_dict = {
-                    # capacity in KW (DC)
-                    "system_capacity": i[1] * 1000.0 * ilr,
-                    "dc_ac_ratio": ilr,
-                    "tilt": 30,
-                    "azimuth": 180,
-                    "inv_eff": 94,
-                    "losses": 14,
-                    "array_type": axis,
-                    "gcr": 0.4,
-                    "adjust:constant": 0,
-                }
-
-                pv_dat = pssc.dict_to_ssc_table(pv_dict, "pvwattsv7")
-                pv = PVWatts.wrap(pv_dat)
-                pv.SolarResource.assign({"solar_resource_data": solar_data})
-                pv.execute()
-
-                ratio = frac[solar_plant.loc[i[0]].zone_id][j]
-                power += ratio * np.array(pv.Outputs.gen) / 1000
-
-            if is_leap_year is True:
-                data_site["Pout"] = np.insert(
-                    power, leap_day, power[leap_day - 24 : leap_day]
-                )
-            else:
-                data_site["Pout"] = power
-
-            data = data.append(data_site, ignore_index=True, sort=False)
-
-    data["plant_id"] = data["plant_id"].astype(np.int32)
-    data["ts_id"] = data["ts_id"].astype(np.int32)
-
-    data.sort_values(by=["ts_id", "plant_id"], inplace=True)
-    data.reset_index(inplace=True, drop=True)
-
-    return data
+        )
+
+    return weather
+
+
+def simulate_power(
+    solar_plant,
+    weather,
+    year="2016",
+    pv_parameters=None,
+    max_workers=1,
+    tolerance=None,
+    tracking=None,
+):
+    """Calculate the power output of solar plants using the System Adviser Model
+    (SAM) and previously retrieved weather data. Each location is simulated once
+    for a 1 MW system and the output is scaled by the plant capacities, see
+    :func:`_simulate_site` for the accuracy of this approximation.
+
+    :param pandas.DataFrame solar_plant: data frame with *'lat'*, *'lon'*,
+        *'Pmax'* and *'zone_id'* as columns and *'plant_id'* as index.
+    :param dict weather: weather data at the plant locations as returned by
+        :func:`retrieve_weather_data`.
+    :param str year: year of the weather data.
+    :param dict/list pv_parameters: PVWatts inputs overriding
+        :data:`default_pv_parameters`, e.g. *'dc_ac_ratio'*, *'tilt'* or
+        *'losses'*. The array type is set by ``tracking``. If a list of
+        dictionaries is given, the plants are simulated for each parameter set in
+        a single batch.
+    :param int max_workers: number of processes running the SAM simulations. If
+        None, use all the processors of the machine. If 1, simulations are run
+        serially in the current process.
+    :param float tolerance: grid cell size (in degrees) used to merge nearby plant
+        locations. Must be the one used to retrieve the weather data.
+    :param tuple/dict/list tracking: fraction of the capacity with fixed tilt,
+        single-axis and dual-axis tracking, as a 3-tuple used for all the plants
+        or a dictionary of 3-tuples keyed by zone id. If None, or for the zones
+        missing from the dictionary, the fractions of the EIA 860 solar plants in
+        the state (or interconnect) are used. If ``pv_parameters`` is a list, a
+        list of the same length can be given, one item per parameter set.
+    :return: (*pandas.DataFrame/list*) -- data frame with *'Pout'*, *'plant_id'*,
+        *'ts'* and *'ts_id'* as columns. The power output is in MWh. A list of data
+        frames, one per parameter set, if ``pv_parameters`` is a list.
+    :raises KeyError: if weather data are missing for a plant location.
+    :raises ValueError: if *'array_type'* is in ``pv_parameters`` or if the
+        tracking list and the parameter sets have different lengths.
+    """
+    parameter_sets = (
+        pv_parameters if isinstance(pv_parameters, list) else [pv_parameters]
+    )
+    if any("array_type" in (p or {}) for p in parameter_sets):
+        raise ValueError("array_type is set with tracking")
+    tracking_sets = (
+        tracking if isinstance(tracking, list) else [tracking] * len(parameter_sets)
+    )
+    if len(tracking_sets) != len(parameter_sets):
+        raise ValueError("tracking must have one item per parameter set")
+
+    ts, gather = _get_sam_time_index(year)
+
+    # Identify unique location
+    location, location_id = get_plant_location_groups(solar_plant, tolerance)
+    keys = [(str(loc.lon), str(loc.lat)) for loc in location.itertuples()]
+    for key in keys:
+        if key not in weather:
+            raise KeyError("No weather data at lat=%s, lon=%s" % (key[1], key[0]))
+
+    # PV tracking ratios
+    # By state and by interconnect when EIA data do not have any solar PV in
+    # the state
+    pv_ratio = get_pv_tracking_ratio(get_pv_tracking_data())
+    frac = {}
+    for i in solar_plant.zone_id.unique():
+        state = id2abv[i]
+        if state in pv_ratio:
+            frac[i] = pv_ratio[state]
+        else:
+            frac[i] = pv_ratio[abv2interconnect[state]]
+    eia_ratio = np.array([frac[i] for i in solar_plant.zone_id])
+    capacity = solar_plant.Pmax.to_numpy(dtype=float)
+
+    # Power output of a 1 MW (AC) system for each tracking technology by site
+    tasks = [(weather[key], p) for p in parameter_sets for key in keys]
+    if max_workers == 1:
+        unit_power = [_simulate_site(*t) for t in tqdm(tasks, total=len(tasks))]
+    else:
+        with ProcessPoolExecutor(max_workers) as executor:
+            unit_power = list(executor.map(_simulate_site, *zip(*tasks)))
+
+    data = []
+    for k in range(len(parameter_sets)):
+        site_power = np.stack(unit_power[k * len(keys) : (k + 1) * len(keys)])
+        ratio = _get_tracking_ratio(solar_plant.zone_id, tracking_sets[k], eia_ratio)
+        # 8760 x plant array, the leap day (if any) is added with the gather index
+        power = np.zeros((site_power.shape[2], len(solar_plant)))
+        for axis in range(3):
+            power += site_power[location_id, axis, :].T * ratio[:, axis]
+        power *= capacity
+        data.append(
+            get_power_output_data_frame(power[gather], solar_plant.index.values, ts)
+        )
+
+    return data if isinstance(pv_parameters, list) else data[0]
+
+
+def _get_tracking_ratio(zone_id, tracking, default):
+    """Get the fraction of the capacity of each plant using each tracking
+    technology.
+
+    :param pandas.Series zone_id: zone id of the plants.
+    :param tuple/dict tracking: fractions of fixed tilt, single-axis and dual-axis
+        tracking for all the plants or by zone id, see :func:`simulate_power`.
+    :param numpy.ndarray default: array of shape (n, 3) giving the fractions used
+        when ``tracking`` is None or for the zones missing from the dictionary.
+    :return: (*numpy.ndarray*) -- array of shape (n, 3).
+    """
+    if tracking is None:
+        return default
+    if not isinstance(tracking, dict):
+        return np.broadcast_to(np.asarray(tracking, dtype=float), default.shape)
+
+    ratio = default.copy()
+    zone_id = zone_id.to_numpy()
+    for zone, frac in tracking.items():
+        ratio[zone_id == zone] = frac
+    return ratio
+
+
+def _get_sam_time_index(year):
+    """Get the timestamps of a year and map them to the 365 days simulated by SAM.
+    The leap day, if any, is skipped by SAM and filled with the data of the
+    previous day.
+
+    :param str year: year.
+    :return: (*tuple*) -- first element is the hourly timestamps of the year as a
+        pandas.DatetimeIndex. Second element is a numpy.ndarray giving, for each
+        timestamp, the index of the hour in the 8760 hours simulated by SAM.
+    """
+    ts = pd.date_range(start="%s-01-01-00" % year, end="%s-12-31-23" % year, freq="H")
+    gather = np.arange(len(ts))
+    if len(ts) > 365 * 24:
+        leap_day = (pd.Timestamp("%s-02-29-00" % year).dayofyear - 1) * 24
+        gather[leap_day:] -= 24
+    return ts, gather
+
+
+def _simulate_site(psm3_data, pv_parameters=None):
+    """Run PVWatts at a site for a 1 MW (AC) system and each tracking technology.
+    The result is scaled by capacity for all the plants located at the site. This
+    is an approximation: the self-shading of the array rows (see *'gcr'*) depends
+    on the size of the system in PVWatts, hence fixed tilt and single-axis outputs
+    differ from a simulation at the plant capacity by a fraction of a percent.
+
+    :param prereise.gather.solardata.nsrdb.nrel_api.Psm3Data psm3_data: weather
+        data at the site. The data frame is converted in the format expected by
+        PySAM here, in the worker process.
+    :param dict pv_parameters: PVWatts inputs overriding
+        :data:`default_pv_parameters`. *'array_type'* is set for each tracking
+        technology.
+    :return: (*numpy.ndarray*) -- array of shape (3, 8760). Rows are the power
+        output (in MWh) of fixed tilt, single-axis and dual-axis tracking systems.
+    """
+    pv_dict = {**default_pv_parameters, **(pv_parameters or {})}
+    # capacity in KW (DC)
+    pv_dict["system_capacity"] = 1000.0 * pv_dict["dc_ac_ratio"]
+    pv_dict["array_type"] = 0
+
+    pv_dat = pssc.dict_to_ssc_table(pv_dict, "pvwattsv7")
+    pv = PVWatts.wrap(pv_dat)
+    pv.SolarResource.assign({"solar_resource_data": psm3_data.to_dict()})
+
+    unit_power = np.empty((3, 365 * 24))
+    for j, axis in enumerate([0, 2, 4]):
+        pv.SystemDesign.array_type = axis
+        pv.execute()
+        unit_power[j] = np.array(pv.Outputs.gen) / 1000
+
+    return unit_power
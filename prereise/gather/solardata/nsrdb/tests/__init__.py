@@ -1 +1 @@
-__all__ = ["test_nrel_api"]
+__all__ = ["test_nrel_api", "test_sam"]
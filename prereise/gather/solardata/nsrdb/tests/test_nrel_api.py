@@ -27,3 +27,23 @@ def test_psm3_to_dict():
     psm3_dict = psm3.to_dict()
     for k in ("tz", "elev", "day", "month", "year", "dn", "wspd"):
         assert k in psm3_dict.keys()
+
+
+def test_psm3_to_dict_date_components():
+    for tz in (None, "US/Pacific"):
+        idx = pd.date_range("2016-03-13", periods=48, freq="H", tz=tz)
+        df = pd.DataFrame({"DHI": range(48)}, index=idx)
+        psm3_dict = Psm3Data(1, 2, 8, 8, df).to_dict()
+        assert list(psm3_dict["year"]) == idx.year.tolist()
+        assert list(psm3_dict["month"]) == idx.month.tolist()
+        assert list(psm3_dict["day"]) == idx.day.tolist()
+        assert list(psm3_dict["hour"]) == idx.hour.tolist()
+        assert list(psm3_dict["minute"]) == idx.minute.tolist()
+        assert psm3_dict["df"] == list(range(48))
+
+
+def test_psm3_to_dict_share_date_components():
+    idx = pd.date_range("2016-01-01", periods=24, freq="H")
+    psm3_1 = Psm3Data(1, 2, 8, 8, pd.DataFrame({"DNI": range(24)}, index=idx))
+    psm3_2 = Psm3Data(3, 4, 8, 8, pd.DataFrame({"DNI": range(1, 25)}, index=idx))
+    assert psm3_1.to_dict()["hour"] is psm3_2.to_dict()["hour"]
@@ -0,0 +1,143 @@
+import numpy as np
+import pandas as pd
+import PySAM.Pvwattsv7 as PVWatts
+import PySAM.PySSC as pssc
+import pytest
+
+from prereise.gather.solardata.nsrdb import sam
+from prereise.gather.solardata.nsrdb.nrel_api import NrelApi, Psm3Data
+
+
+def create_solar_plant():
+    return pd.DataFrame(
+        {
+            "lat": [35.0, 35.01, 36.0],
+            "lon": [-110.0, -110.01, -111.0],
+            "Pmax": [10.0, 20.0, 50.0],
+            "zone_id": [201, 201, 301],
+        },
+        index=pd.Index([3, 1, 2], name="plant_id"),
+    )
+
+
+def create_weather(solar_plant, year="2015", tolerance=None):
+    location, _ = sam.get_plant_location_groups(solar_plant, tolerance)
+    return {
+        (str(loc.lon), str(loc.lat)): create_psm3_data(loc.lat, loc.lon, year)
+        for loc in location.itertuples()
+    }
+
+
+def create_psm3_data(lat, lon, year="2015"):
+    ts, _ = sam._get_sam_time_index(year)
+    dates = ts[(ts.month != 2) | (ts.day != 29)]
+    sun = np.clip(np.sin((dates.hour.to_numpy() - 6) / 12 * np.pi), 0, None)
+    rng = np.random.default_rng(int(abs(lat * lon)))
+    data = pd.DataFrame(
+        {
+            "DHI": 100 * sun,
+            "DNI": 800 * sun * rng.uniform(0.5, 1, len(dates)),
+            "Wind Speed": rng.uniform(0, 8, len(dates)),
+            "Temperature": 15 + 10 * sun,
+        },
+        index=dates,
+    )
+    return Psm3Data(lat, lon, 0.0, 1000.0, data)
+
+
+def run_pvwatts(psm3_data, capacity, array_type, pv_parameters=None):
+    pv_dict = {**sam.default_pv_parameters, **(pv_parameters or {})}
+    pv_dict["system_capacity"] = 1000.0 * capacity * pv_dict["dc_ac_ratio"]
+    pv_dict["array_type"] = array_type
+    pv = PVWatts.wrap(pssc.dict_to_ssc_table(pv_dict, "pvwattsv7"))
+    pv.SolarResource.assign({"solar_resource_data": psm3_data.to_dict()})
+    pv.execute()
+    return np.array(pv.Outputs.gen) / 1000
+
+
+def test_simulate_site_scaling_error():
+    psm3_data = create_psm3_data(35.0, -110.0)
+    capacity = 50
+    unit_power = sam._simulate_site(psm3_data)
+
+    for j, axis in enumerate([0, 2, 4]):
+        power = run_pvwatts(psm3_data, capacity, axis)
+
+        error = np.abs(capacity * unit_power[j] - power)
+        assert error.max() < 0.005 * power.max()
+        assert abs(capacity * unit_power[j].sum() / power.sum() - 1) < 0.005
+
+
+def test_retrieve_weather_data_tolerance(monkeypatch):
+    def get_psm3_at(self, lat, lon, attributes, year, leap_day, dates=None):
+        return create_psm3_data(float(lat), float(lon), year)
+
+    monkeypatch.setattr(NrelApi, "get_psm3_at", get_psm3_at)
+    solar_plant = create_solar_plant()
+    weather = sam.retrieve_weather_data(
+        solar_plant, "email", "key", "2015", None, tolerance=0.1
+    )
+    assert list(weather) == [("-110.0", "35.0"), ("-111.0", "36.0")]
+
+    power = sam.simulate_power(solar_plant, weather, "2015", tolerance=0.1)
+    assert len(power) == 8760 * len(solar_plant)
+    with pytest.raises(KeyError):
+        sam.simulate_power(solar_plant, weather, "2015")
+
+
+def test_simulate_power_max_workers():
+    solar_plant = create_solar_plant()
+    weather = create_weather(solar_plant)
+    serial = sam.simulate_power(solar_plant, weather, "2015")
+    parallel = sam.simulate_power(solar_plant, weather, "2015", max_workers=2)
+    pd.testing.assert_frame_equal(serial, parallel)
+    assert serial.plant_id.unique().tolist() == [1, 2, 3]
+
+
+def test_simulate_power_leap_year():
+    solar_plant = create_solar_plant()
+    power = sam.simulate_power(solar_plant, create_weather(solar_plant, "2016"), "2016")
+    assert len(power) == 8784 * len(solar_plant)
+    ts = pd.DatetimeIndex(power.ts)
+    feb_28 = power[(ts.month == 2) & (ts.day == 28)]
+    feb_29 = power[(ts.month == 2) & (ts.day == 29)]
+    np.testing.assert_array_equal(feb_29.Pout, feb_28.Pout)
+    np.testing.assert_array_equal(feb_29.plant_id, feb_28.plant_id)
+    assert feb_29.Pout.sum() > 0
+
+
+def test_simulate_power_parameter_sets():
+    solar_plant = create_solar_plant()
+    weather = create_weather(solar_plant)
+    parameter_sets = [{"tilt": 20}, {"losses": 10, "dc_ac_ratio": 1.3}, {}]
+    tracking = [None, {301: (0, 0, 1)}, (0, 1, 0)]
+    batch = sam.simulate_power(
+        solar_plant, weather, "2015", parameter_sets, tracking=tracking
+    )
+    assert len(batch) == 3
+    for power, pv_parameters, frac in zip(batch, parameter_sets, tracking):
+        pd.testing.assert_frame_equal(
+            power,
+            sam.simulate_power(
+                solar_plant, weather, "2015", pv_parameters, tracking=frac
+            ),
+        )
+    assert not batch[0].Pout.equals(batch[1].Pout)
+
+    # Single-axis tracking for all the plants
+    for plant in solar_plant.itertuples():
+        psm3_data = weather[(str(plant.lon), str(plant.lat))]
+        expected = run_pvwatts(psm3_data, 1, 2) * plant.Pmax
+        pout = batch[2][batch[2].plant_id == plant.Index].Pout.to_numpy()
+        np.testing.assert_allclose(pout, expected)
+
+    # Dual-axis tracking in zone 301 only
+    plant = solar_plant.loc[2]
+    psm3_data = weather[(str(plant.lon), str(plant.lat))]
+    expected = run_pvwatts(psm3_data, 1, 4, parameter_sets[1]) * plant.Pmax
+    np.testing.assert_allclose(batch[1][batch[1].plant_id == 2].Pout, expected)
+
+    with pytest.raises(ValueError):
+        sam.simulate_power(solar_plant, weather, "2015", {"array_type": 2})
+    with pytest.raises(ValueError):
+        sam.simulate_power(solar_plant, weather, "2015", [{}], tracking=[None] * 2)
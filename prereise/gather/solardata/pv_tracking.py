@@ -1,17 +1,38 @@
 import os
 
+import numpy as np
 import pandas as pd
-from powersimdata.network.usa_tamu.constants.zones import abv
+from powersimdata.network.usa_tamu.constants.zones import abv, interconnect2abv
+
+from prereise.gather.cache_util import load_cached_table
+
+tracking_columns = {
+    "Fixed Tilt?": "fix",
+    "Single-Axis Tracking?": "single",
+    "Dual-Axis Tracking?": "dual",
+}
 
 
 def get_pv_tracking_data():
     """Load solar PV information from EIA860 for all plants installed in 2016.
+    The csv file is only parsed once, see
+    :func:`prereise.gather.cache_util.load_cached_table`.
 
     :return: (*pandas.DataFrame*) -- solar pv plant information as found in
         form EIA860
     """
     file = os.path.join(os.path.dirname(__file__), "data", "3_3_Solar_Y2016.csv")
 
+    return load_cached_table(file, _read_pv_tracking_data)
+
+
+def _read_pv_tracking_data(file):
+    """Parse solar PV information from EIA860.
+
+    :param str file: path to the csv file.
+    :return: (*pandas.DataFrame*) -- solar pv plant information with categorical
+        state and tracking technology flags and single precision capacity.
+    """
     solar_plant_info = pd.read_csv(
         file,
         skiprows=range(1),
@@ -28,7 +49,13 @@ def get_pv_tracking_data():
     pv_info = solar_plant_info[solar_plant_info["Prime Mover"] == "PV"].copy()
     pv_info.drop("Prime Mover", axis=1, inplace=True)
 
-    return pv_info
+    return pv_info.astype(
+        {
+            "State": "category",
+            "Nameplate Capacity (MW)": np.float32,
+            **{c: "category" for c in tracking_columns},
+        }
+    )
 
 
 def get_pv_tracking_ratio_state(pv_info, state):
@@ -55,20 +82,45 @@ def get_pv_tracking_ratio_state(pv_info, state):
         print("No solar PV plant in %s" % ", ".join(state))
         return
 
-    fix = 0
-    single = 0
-    dual = 0
-    total_capacity = 0
-    for i in pv_info_state.index:
-        capacity = pv_info_state.loc[i]["Nameplate Capacity (MW)"]
-        if pv_info_state.loc[i]["Single-Axis Tracking?"] == "Y":
-            single += capacity
-            total_capacity += capacity
-        if pv_info_state.loc[i]["Dual-Axis Tracking?"] == "Y":
-            dual += capacity
-            total_capacity += capacity
-        if pv_info_state.loc[i]["Fixed Tilt?"] == "Y":
-            fix += capacity
-            total_capacity += capacity
+    capacity = pv_info_state["Nameplate Capacity (MW)"]
+    fix, single, dual = [
+        capacity[pv_info_state[c] == "Y"].sum() for c in tracking_columns
+    ]
+    total_capacity = fix + single + dual
 
     return fix / total_capacity, single / total_capacity, dual / total_capacity
+
+
+def get_pv_tracking_ratio(pv_info):
+    """Get solar PV tracking technology ratios for all states and interconnects
+    in 2016 from EIA860.
+
+    :param pandas.DataFrame pv_info: solar pv plant information as found in
+        form EIA860 as returned by :func:`get_pv_tracking_data`.
+    :return: (*dict*) -- keys are state abbreviations and interconnect names.
+        Values are the tracking technology proportion (fix, 1-axis, 2-axis).
+        States and interconnects without any solar PV plant are omitted.
+    """
+    capacity = pv_info["Nameplate Capacity (MW)"].to_numpy()
+    state_capacity = (
+        pd.DataFrame(
+            {
+                t: capacity * (pv_info[c] == "Y").to_numpy()
+                for c, t in tracking_columns.items()
+            }
+        )
+        .groupby(pv_info["State"].to_numpy())
+        .sum()
+    )
+    interconnect_capacity = pd.DataFrame(
+        {
+            i: state_capacity.loc[state_capacity.index.isin(list(s))].sum()
+            for i, s in interconnect2abv.items()
+        }
+    ).T
+    capacity = pd.concat([state_capacity, interconnect_capacity])
+
+    total_capacity = capacity.sum(axis=1)
+    ratio = capacity[total_capacity > 0].div(total_capacity[total_capacity > 0], axis=0)
+
+    return dict(zip(ratio.index, ratio.itertuples(index=False, name=None)))
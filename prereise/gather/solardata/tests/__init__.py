@@ -1 +1 @@
-__all__ = ["mock_pv_info", "test_pv_tracking"]
+__all__ = ["mock_pv_info", "test_helpers", "test_pv_tracking"]
@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from prereise.gather.solardata.helpers import (
+    get_plant_info_unique_location,
+    get_plant_location_groups,
+    get_power_output_data_frame,
+)
+
+
+def _create_plant():
+    return pd.DataFrame(
+        {
+            "lat": [40.1, 35.0, 40.1, 35.01, 40.1],
+            "lon": [-105.2, -110.0, -105.2, -110.01, -105.3],
+            "Pmax": [1.0, 2.0, 3.0, 4.0, 5.0],
+        },
+        index=[11, 12, 13, 14, 15],
+    )
+
+
+def test_get_plant_location_groups():
+    location, location_id = get_plant_location_groups(_create_plant())
+    assert location_id.tolist() == [0, 1, 0, 2, 3]
+    assert location["lat"].tolist() == [40.1, 35.0, 35.01, 40.1]
+    assert location["lon"].tolist() == [-105.2, -110.0, -110.01, -105.3]
+
+
+def test_get_plant_location_groups_with_tolerance():
+    location, location_id = get_plant_location_groups(_create_plant(), 0.04)
+    assert location_id.tolist() == [0, 1, 0, 1, 2]
+    assert location["lat"].tolist() == [40.1, 35.0, 40.1]
+    assert location["lon"].tolist() == [-105.2, -110.0, -105.3]
+
+
+def test_get_plant_location_groups_invalid_tolerance():
+    with pytest.raises(ValueError, match="tolerance must be positive"):
+        get_plant_location_groups(_create_plant(), 0)
+
+
+def test_get_plant_info_unique_location():
+    coord = get_plant_info_unique_location(_create_plant())
+    assert list(coord.keys()) == [
+        ("-105.2", "40.1"),
+        ("-110.0", "35.0"),
+        ("-110.01", "35.01"),
+        ("-105.3", "40.1"),
+    ]
+    assert coord[("-105.2", "40.1")] == [(11, 1.0), (13, 3.0)]
+    assert coord[("-105.3", "40.1")] == [(15, 5.0)]
+
+
+def test_get_power_output_data_frame():
+    ts = pd.date_range("2016-01-01", periods=3, freq="H")
+    power = np.array([[1.0, 10.0], [2.0, 20.0], [3.0, 30.0]])
+    data = get_power_output_data_frame(power, np.array([7, 5]), ts)
+
+    assert data.columns.tolist() == ["Pout", "plant_id", "ts", "ts_id"]
+    assert data["Pout"].tolist() == [10, 1, 20, 2, 30, 3]
+    assert data["plant_id"].tolist() == [5, 7] * 3
+    assert data["ts_id"].tolist() == [1, 1, 2, 2, 3, 3]
+    assert data["ts"].tolist() == ts.repeat(2).tolist()
+    assert data["plant_id"].dtype == np.int32
+    assert data["ts_id"].dtype == np.int32
@@ -1,6 +1,9 @@
 import pytest
 
-from prereise.gather.solardata.pv_tracking import get_pv_tracking_ratio_state
+from prereise.gather.solardata.pv_tracking import (
+    get_pv_tracking_ratio,
+    get_pv_tracking_ratio_state,
+)
 from prereise.gather.solardata.tests.mock_pv_info import create_mock_pv_info
 
 pv_info = create_mock_pv_info()
@@ -68,3 +71,12 @@ def test_ratio_state_with_multiple_plants_and_tracking_systems():
     state = ["CA"]
     ratio = get_pv_tracking_ratio_state(pv_info, state)
     assert ratio == (1.0 / 10, 6.0 / 10, 3.0 / 10)
+
+
+def test_ratio_all_states_and_interconnects():
+    ratio = get_pv_tracking_ratio(pv_info)
+    for state in ["UT", "WA", "CA"]:
+        assert ratio[state] == get_pv_tracking_ratio_state(pv_info, [state])
+    assert ratio["Western"] == (6.0 / 30, 11.0 / 30, 13.0 / 30)
+    assert "MT" not in ratio
+    assert "Eastern" not in ratio
@@ -1,5 +1,6 @@
 __all__ = [
     "mock_generation_data_frame",
+    "test_cache_util",
     "test_get_monthly_net_generation",
     "test_rate_limit",
     "test_retry",
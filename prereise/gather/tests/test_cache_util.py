@@ -0,0 +1,95 @@
+import os
+
+import pandas as pd
+import pytest
+
+from prereise.gather import cache_util
+from prereise.gather.cache_util import load_cached_table
+
+
+class BuildCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, file):
+        self.count += 1
+        return pd.read_csv(file)
+
+
+@pytest.fixture
+def source(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_util, "_tables", {})
+    file = tmp_path / "table.csv"
+    file.write_text("a,b\n1,x\n2,y\n")
+    return str(file)
+
+
+def test_file_parsed_once(source):
+    build = BuildCounter()
+    first = load_cached_table(source, build)
+    second = load_cached_table(source, build)
+    assert build.count == 1
+    assert first.equals(second)
+    assert os.path.isfile(source.replace(".csv", ".pkl"))
+
+
+def test_cache_file_reused_across_processes(source, monkeypatch):
+    build = BuildCounter()
+    load_cached_table(source, build)
+    monkeypatch.setattr(cache_util, "_tables", {})
+    table = load_cached_table(source, build)
+    assert build.count == 1
+    assert table["a"].tolist() == [1, 2]
+
+
+def test_file_parsed_again_when_modified(source):
+    build = BuildCounter()
+    load_cached_table(source, build)
+    with open(source, "a") as f:
+        f.write("3,z\n")
+    table = load_cached_table(source, build)
+    assert build.count == 2
+    assert table["a"].tolist() == [1, 2, 3]
+
+
+def test_table_is_a_copy(source):
+    table = load_cached_table(source, BuildCounter())
+    table["a"] = 0
+    assert load_cached_table(source, BuildCounter())["a"].tolist() == [1, 2]
+
+
+def test_corrupt_cache_file_rebuilt(source):
+    cache_file = source.replace(".csv", ".pkl")
+    with open(cache_file, "wb") as f:
+        f.write(b"\x80\x04corrupt")
+    build = BuildCounter()
+    assert load_cached_table(source, build)["a"].tolist() == [1, 2]
+    assert build.count == 1
+
+
+def test_file_parsed_again_when_build_changes(source, monkeypatch):
+    load_cached_table(source, BuildCounter())
+    monkeypatch.setattr(cache_util, "_tables", {})
+
+    def read_index(file):
+        return pd.read_csv(file, index_col="a")
+
+    assert load_cached_table(source, read_index).index.tolist() == [1, 2]
+
+    build = BuildCounter()
+    load_cached_table(source, build, version=1)
+    monkeypatch.setattr(cache_util, "_tables", {})
+    load_cached_table(source, build, version=1)
+    load_cached_table(source, build, version=2)
+    assert build.count == 2
+
+
+def test_write_pickle(tmp_path):
+    file = str(tmp_path / "obj.pkl")
+    cache_util.write_pickle({"a": 1}, file)
+    assert cache_util.read_pickle(file) == {"a": 1}
+
+    with pytest.raises(Exception):
+        cache_util.write_pickle({"a": lambda x: x}, file)
+    assert os.listdir(tmp_path) == ["obj.pkl"]
+    assert cache_util.read_pickle(file) == {"a": 1}
@@ -6,6 +6,8 @@ import numpy as np
 import pandas as pd
 from scipy.stats import norm
 
+from prereise.gather.cache_util import load_cached_table
+
 data_dir = path.abspath(path.join(path.dirname(__file__), "..", "data"))
 
 
@@ -110,7 +112,8 @@ def build_state_curves(Form860, PowerCurves, maxspd=30, default="IEC class 2", r
 
 
 def get_form_860(data_dir, year=2016):
-    """Read data for EIA Form 860.
+    """Read data for EIA Form 860. The csv file is only parsed once, see
+    :func:`prereise.gather.cache_util.load_cached_table`.
 
     :param str data_dir: data directory.
     :param int year: EIA data year to get.
@@ -122,21 +125,34 @@ def get_form_860(data_dir, year=2016):
         raise ValueError("data_dir is not a valid directory")
     if not isinstance(year, int):
         raise TypeError("year is not an int")
-    regex_str = r"3_2_Wind_Y(\d{4}).csv"
-    valid_years = [
-        int(re.match(regex_str, f).group(1))
-        for f in os.listdir(data_dir)
-        if re.match(regex_str, f)
-    ]
-    if year not in valid_years:
+    form_860_filename = "3_2_Wind_Y{year}.csv".format(year=year)
+    form_860_path = path.join(data_dir, form_860_filename)
+    if not path.isfile(form_860_path):
+        regex_str = r"3_2_Wind_Y(\d{4}).csv"
+        valid_years = [
+            int(re.match(regex_str, f).group(1))
+            for f in os.listdir(data_dir)
+            if re.match(regex_str, f)
+        ]
         err_msg = "form data for year {year} not found. ".format(year=year)
         err_msg += "Years with data: " + ", ".join(str(valid_years))
         raise ValueError(err_msg)
 
-    form_860_filename = "3_2_Wind_Y{year}.csv".format(year=year)
-    form_860_path = path.join(data_dir, form_860_filename)
+    return load_cached_table(form_860_path, _read_form_860)
+
+
+def _read_form_860(form_860_path):
+    """Parse EIA Form 860 csv file.
+
+    :param str form_860_path: path to the csv file.
+    :return: (*pandas.DataFrame*) -- dataframe with Form 860 data, with
+        categorical state and single precision capacities.
+    """
     form_860 = pd.read_csv(form_860_path, skiprows=1)
-    return form_860
+    capacity_columns = [c for c in form_860.columns if "Capacity (MW)" in c]
+    return form_860.astype(
+        {"State": "category", **{c: np.float32 for c in capacity_columns}}
+    )
 
 
 def get_power(PowerCurves, StatePowerCurves, wspd, turbine, default="IEC class 2"):